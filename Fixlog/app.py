@@ -1,42 +1,202 @@
-from flask import Flask, render_template, request, redirect, url_for, session, abort, jsonify
-import json
+from flask import Flask, render_template, request, redirect, url_for, session, abort, jsonify, get_template_attribute
 import os
 from uuid import uuid4
-from datetime import datetime, timedelta
 from templates.settings.user_store import find_user
 from templates.settings import settings_bp
+from storage import get_store, codec
+from storage.counters import open_view_counter
+from storage.retention import open_retention
+from storage.blobs import extract_images, first_upload, save_stream, thumb_url, preview_images, thumbs_pending
+from httpcache import conditional, conditional_json, page_state
+from fragments import FragmentCache
+from viewed import first_view
+import compression
+import sessions
+from catalog import CachedCollection, HotBoard, SORT_FIELDS, paginate, decode_cursor
 from werkzeug.exceptions import RequestEntityTooLarge
 from werkzeug.utils import secure_filename
+from flask.json.provider import DefaultJSONProvider
+
+
+class CodecJSONProvider(DefaultJSONProvider):
+    """jsonify / request.get_json 改用 storage.codec（有 orjson 就用 orjson），輸出不縮排"""
+
+    def dumps(self, obj, **kwargs):
+        return codec.dumps(obj, default=self.default).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return codec.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(codec.dumps(obj, default=self.default), mimetype=self.mimetype)
+
 
 app = Flask(__name__)
+app.json = CodecJSONProvider(app)
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50 MB
 UPLOAD_DIR = os.path.join(app.root_path, 'static', 'uploads')
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 app.secret_key = 'super_secret_key_123'
+# 列表頁每頁筆數（可用 ?limit= 覆寫，上限 100）
+app.config['PAGE_SIZE'] = int(os.environ.get('FIXLOG_PAGE_SIZE', 20))
 # 註冊設定頁面
 app.register_blueprint(settings_bp)
-
-# 準備資料儲存資料夾與 repairs.json
+# 上傳圖片的縮圖（沒有縮圖時回原圖）
+app.jinja_env.filters['thumb'] = thumb_url
+app.jinja_env.filters['preview_images'] = preview_images
+# HTML / JSON 回應壓縮、static 預先壓縮（FIXLOG_COMPRESS=0 關閉）
+compression.init_app(app)
+# 伺服器端 session（FIXLOG_SESSION=file / sqlite；預設仍是簽章 cookie）
+sessions.init_app(app)
+
+# 準備資料儲存資料夾；實際存取交給 storage（FIXLOG_STORAGE=json / sqlite）
 os.makedirs('data', exist_ok=True)
-repairs_path = 'data/repairs.json'
-
-if not os.path.exists(repairs_path):
-    with open(repairs_path, 'w', encoding='utf-8') as f:
-        json.dump([], f, ensure_ascii=False, indent=2)
-
-with open(repairs_path, encoding='utf-8') as f:
-    repair_data = json.load(f)
-
-# 初始化 repair_data 的 views 欄位
-for repair in repair_data:
-    if 'views' not in repair:
-        repair['views'] = 0
+store = get_store()
+# 瀏覽數持久化模式見 storage/counters.py（FIXLOG_VIEW_MODE=log / buffer / sync）
+view_counter = open_view_counter(store)
+# 草稿保留政策（每人上限、過期天數）由背景執行緒整理，見 storage/retention.py
+draft_retention = open_retention(store)
+
+# 多個 worker 同時跑時，每個請求最多每 FIXLOG_SYNC_INTERVAL 秒檢查一次 store 的變更戳記，
+# 別的 worker 改過資料才重新載入（或只補上瀏覽數）
+SYNC_INTERVAL = float(os.environ.get('FIXLOG_SYNC_INTERVAL', 1.0))
+
+# 維修紀錄常駐記憶體：id → 紀錄的索引、/search 用的倒排索引（標題 + 摘要 + 內文）、
+# 列表頁用的預排順序（標題 / 日期 / 瀏覽數），新增 / 刪除時增量更新。
+# 常駐的只有列表欄位，內文（details）在詳細頁才讀，最近讀過的 FIXLOG_BODY_CACHE 篇留在記憶體
+BODY_CACHE = int(os.environ.get('FIXLOG_BODY_CACHE', 256))
+repairs = CachedCollection(store.repairs, fold=lambda items: view_counter.fold('repairs', items),
+                           check_interval=SYNC_INTERVAL, search=True, body_cache=BODY_CACHE,
+                           views=lambda read: view_counter.views('repairs', read))
+repair_data = repairs.records
+search_index = repairs.search
+repair_orders = repairs.orders
+
+# 熱門文章：背景維護的排行榜，分數是隨時間衰減的瀏覽數（見 catalog/hot.py）
+#   FIXLOG_HOT_HALF_LIFE 半衰期（小時，預設 72）、FIXLOG_HOT_TOP 前幾名（預設 3）、
+#   FIXLOG_HOT_MIN 至少要有多少「衰減後的瀏覽數」才算熱門（預設 1）
+hot_board = HotBoard(lambda: repair_data,
+                     half_life=float(os.environ.get('FIXLOG_HOT_HALF_LIFE', 72)) * 3600,
+                     top_n=int(os.environ.get('FIXLOG_HOT_TOP', 3)),
+                     min_score=float(os.environ.get('FIXLOG_HOT_MIN', 1)))
+
+# 工具目錄常駐記憶體；tools.json（或 SQLite tools 表）被外部改動時才重新載入
+tool_data = CachedCollection(store.tools, fold=lambda items: view_counter.fold('tools', items),
+                             check_interval=SYNC_INTERVAL, body_cache=BODY_CACHE,
+                             views=lambda read: view_counter.views('tools', read))
+
+# render 好的列表卡片與詳細頁內文（LRU，上限 FIXLOG_FRAGMENT_CACHE_MB）；資料變動時清掉對應的片段
+FRAGMENT_CACHE_BYTES = int(os.environ.get('FIXLOG_FRAGMENT_CACHE_MB', 16)) * 1024 * 1024
+repair_fragments = FragmentCache(max_bytes=FRAGMENT_CACHE_BYTES)
+tool_fragments = FragmentCache(max_bytes=FRAGMENT_CACHE_BYTES)
+
+def _invalidate_fragments(cache):
+    def on_change(record_id, views_only=False):
+        # 內文片段與瀏覽數無關，瀏覽數變了只重 render 卡片
+        cache.invalidate(record_id, kind='card' if views_only else None)
+    return on_change
+
+repairs.listeners.append(_invalidate_fragments(repair_fragments))
+tool_data.listeners.append(_invalidate_fragments(tool_fragments))
+
+def _cards(cache, macro, rows, hot_ids=()):
+    """列表卡片：以 (id, 瀏覽數, 熱門, 管理員) 為鍵取快取的片段"""
+    card = get_template_attribute('_cards.html', macro)
+    is_admin = session.get('username') == 'admin'
+    # 縮圖還在產生時 render 出來的是原圖網址，先不快取
+    cacheable = not thumbs_pending()
+    out = []
+    for r in rows:
+        hot = r['id'] in hot_ids
+        args = (r, hot, is_admin) if macro == 'repair_card' else (r, is_admin)
+        out.append(cache.render(('card', r['id'], r.get('views', 0), hot, is_admin),
+                                lambda: card(*args), cacheable))
+    return out
+
+def _detail_body(cache, collection, record):
+    """詳細頁內文（圖片換成預覽尺寸）"""
+    return cache.render(('body', record['id']),
+                        lambda: preview_images(collection.body(record['id'])) or '',
+                        not thumbs_pending())
+
+@app.before_request
+def _sync_collections():
+    repairs.refresh()
 
 # 首頁直接導向到登入頁
 @app.route('/')
 def home():
     return redirect(url_for('login'))
 
+def _page_args():
+    """讀取分頁參數：after / before 游標與每頁筆數"""
+    try:
+        limit = int(request.args.get('limit') or app.config['PAGE_SIZE'])
+    except ValueError:
+        limit = app.config['PAGE_SIZE']
+    limit = max(1, min(limit, 100))
+    return decode_cursor(request.args.get('after')), decode_cursor(request.args.get('before')), limit
+
+def _page_links(page):
+    """上一頁 / 下一頁網址，保留其他查詢參數"""
+    args = request.args.to_dict()
+    args.pop('after', None)
+    args.pop('before', None)
+    next_url = url_for(request.endpoint, **args, after=page.next_cursor) if page.has_next else None
+    prev_url = None
+    if page.has_prev:
+        # 沒有游標代表上一頁就是第一頁
+        prev_url = url_for(request.endpoint, **args, before=page.prev_cursor) if page.prev_cursor else url_for(request.endpoint, **args)
+    return next_url, prev_url
+
+def _hot_rows(category=None, subset=None):
+    """置頂的熱門紀錄：排行榜（隨時間衰減的瀏覽數）在目前分類 / 搜尋結果裡的前幾名；
+    一筆都沒有（例如這個分類最近沒人看）回 None，default_page 改用累計瀏覽數前幾名，版面維持「熱門 + 其餘依日期」"""
+    if subset is not None:
+        ids = hot_board.top_among(r['id'] for r in subset)
+    elif category:
+        ids = hot_board.top_by.get(category, ())
+    else:
+        ids = hot_board.top
+    rows = [r for r in map(repair_data.get, ids) if r is not None]
+    return rows or None
+
+def _repair_page(sort, order, category=None, subset=None):
+    """依目前排序取一頁維修紀錄；subset 為搜尋結果"""
+    after, before, limit = _page_args()
+    # 直接沿用預排好的順序，不再每次排序
+    if sort in SORT_FIELDS:
+        return repair_orders.page(sort, order, category=category, subset=subset,
+                                  after=after, before=before, limit=limit)
+    if sort == 'default':
+        return repair_orders.default_page(category=category, subset=subset,
+                                          after=after, before=before, limit=limit,
+                                          hot=_hot_rows(category, subset))
+    # 相關度（搜尋）或未知排序：維持現有順序，游標記錄位置
+    rows = subset if subset is not None else [r for r in repair_data if not category or r.get('category') == category]
+    by_id = {r['id']: r for r in rows}
+    entries = [(i, r['id']) for i, r in enumerate(rows)]
+    return paginate(entries, by_id.get, desc=False, after=after, before=before, limit=limit)
+
+def _listing_json(page, fields, hot_ids=()):
+    """列表的 JSON 版（無限捲動用），不含內文"""
+    items = []
+    for r in page.rows:
+        item = {k: r.get(k) for k in fields}
+        item['hot'] = r['id'] in hot_ids
+        items.append(item)
+    return conditional(page_state(page, items), lambda: jsonify({
+        "ok": True,
+        "items": items,
+        "next": page.next_cursor if page.has_next else None,
+        "prev": page.prev_cursor,
+        "has_next": page.has_next,
+        "has_prev": page.has_prev,
+    }))
+
+REPAIR_LIST_FIELDS = ('id', 'title', 'date', 'author', 'status', 'category', 'views')
+
 #主頁面路由
 @app.route('/index')
 def index():
@@ -46,38 +206,21 @@ def index():
     sort = request.args.get('sort', 'default')
     order = request.args.get('order', 'desc')
 
-    filtered_repairs = [r for r in repair_data if r.get('category') == category] if category else repair_data
-
-    if sort == 'alpha':
-        filtered_repairs.sort(key=lambda x: x['title'])
-    elif sort == 'date':
-        filtered_repairs.sort(key=lambda x: x.get('date', ''), reverse=(order == 'desc'))
-    elif sort == 'views':
-        filtered_repairs.sort(key=lambda x: x.get('views', 0), reverse=(order == 'desc'))
-    elif sort == 'default':
-        top3 = sorted(filtered_repairs, key=lambda x: x.get('views', 0), reverse=True)[:3]
-        rest = sorted(filtered_repairs, key=lambda x: x.get('date', ''), reverse=True)
-        filtered_repairs = top3 + [r for r in rest if r not in top3]
-
-    # 🔥 熱門文章判斷邏輯
-    hot_ids = set()
-    seven_days_ago = datetime.now() - timedelta(days=7)
-    for r in filtered_repairs[:3]:  # 只檢查前 3 名
-        try:
-            post_time = datetime.strptime(r['date'], '%Y-%m-%d %H:%M')
-            if post_time >= seven_days_ago:
-                hot_ids.add(r['id'])
-        except Exception:
-            continue  # 日期格式錯誤則跳過
-
-    # 最後傳給模板
-    return render_template('index.html',
-                       repairs=filtered_repairs,
+    page = _repair_page(sort, order, category=category)
+    hot_ids = hot_board.hot_ids
+    next_url, prev_url = _page_links(page)
+
+    # 最後傳給模板；這一頁的資料沒變就回 304
+    return conditional(page_state(page, sorted(hot_ids)), lambda: render_template('index.html',
+                       repairs=page.rows,
+                       cards=_cards(repair_fragments, 'repair_card', page.rows, hot_ids),
                        username=username,
                        role=role,
                        sort=sort,
                        order=order,
-                       hot_ids=hot_ids)
+                       hot_ids=hot_ids,
+                       next_url=next_url,
+                       prev_url=prev_url))
 
 #訪客登入路由
 @app.route('/visitor')
@@ -90,61 +233,75 @@ def visitor_view():
 @app.route('/search')
 def search():
     keyword = request.args.get('q', '').strip()
-    sort = request.args.get('sort', 'default')  # 排序類型
+    sort = request.args.get('sort', 'relevance')  # 排序類型；預設依相關度
     order = request.args.get('order', 'desc')   # 排序順序（desc 或 asc）
 
     if not keyword:
         return redirect(url_for('index'))
 
-    # 搜尋標題中包含關鍵字的資料
-    results = [r for r in repair_data if keyword.lower() in r['title'].lower()]
-
-    # 排序處理
-    if sort == 'alpha':
-        results.sort(key=lambda x: x['title'])
-    elif sort == 'date':
-        results.sort(key=lambda x: x.get('date', ''), reverse=(order == 'desc'))
-    elif sort == 'views':
-        results.sort(key=lambda x: x.get('views', 0), reverse=(order == 'desc'))
-    elif sort == 'default':
-        # 取前三熱門 + 剩餘按時間排序
-        top3 = sorted(results, key=lambda x: x.get('views', 0), reverse=True)[:3]
-        rest = sorted([r for r in results if r not in top3], key=lambda x: x.get('date', ''), reverse=True)
-        results = top3 + rest
-
-    return render_template(
+    # 查倒排索引（標題、摘要、內文），結果已依相關度排序；排序與分頁沿用預排順序
+    page = _repair_page(sort, order, subset=search_index.search(keyword))
+    next_url, prev_url = _page_links(page)
+    hot_ids = hot_board.hot_ids
+
+    return conditional(page_state(page, sorted(hot_ids)), lambda: render_template(
         'index.html',
-        repairs=results,
+        repairs=page.rows,
+        cards=_cards(repair_fragments, 'repair_card', page.rows, hot_ids),
+        hot_ids=hot_ids,
         username=session.get('username'),
         role=session.get('role'),
         sort=sort,
         order=order,
-        keyword=keyword
-    )
+        keyword=keyword,
+        next_url=next_url,
+        prev_url=prev_url
+    ))
+
+# 列表 JSON 版：參數與 /index、/search 相同（帶 q 即為搜尋）
+@app.route('/api/repairs')
+def api_repairs():
+    keyword = request.args.get('q', '').strip()
+    category = request.args.get('category')
+    sort = request.args.get('sort', 'relevance' if keyword else 'default')
+    order = request.args.get('order', 'desc')
+    if keyword:
+        page = _repair_page(sort, order, subset=search_index.search(keyword))
+    else:
+        page = _repair_page(sort, order, category=category)
+    return _listing_json(page, REPAIR_LIST_FIELDS, hot_board.hot_ids)
+
+def _count_view(collection, kind, record):
+    """記一次瀏覽；sync 模式會當場寫 store，要交給 collection 在寫入鎖裡做（才能記下戳記）。
+    其他模式只碰記錄檔 / 記憶體，不拿 store 的鎖（壓實時是先拿記錄檔的鎖再拿 store 的，反過來會互卡）"""
+    record['views'] = record.get('views', 0) + 1
+    write = lambda: view_counter.record(kind, record['id'])
+    if view_counter.writes_store:
+        collection.touch_views(record, write)
+    else:
+        write()
+        collection.touch_views(record)
 
 @app.route('/repair/<repair_id>')
 def repair_detail(repair_id):
-    repair = next((r for r in repair_data if r['id'] == repair_id), None)
+    repair = repair_data.get(repair_id)
     if not repair:
         abort(404)
 
-    if 'viewed' not in session:
-        session['viewed'] = []
-    if repair_id not in session['viewed']:
-        session['viewed'].append(repair_id)
-        session.modified = True
-        repair['views'] = repair.get('views', 0) + 1
-        with open(repairs_path, 'w', encoding='utf-8') as f:
-            json.dump(repair_data, f, ensure_ascii=False, indent=2)
+    # 看過的紀錄記在 session 裡固定大小的 Bloom filter（見 viewed.py），cookie 不會越看越大
+    if first_view('repairs', repair_id):
+        _count_view(repairs, 'repairs', repair)
+        hot_board.bump(repair)
 
-    return render_template('detail.html', repair=repair, username=session.get('username'), role=session.get('role'))
+    # 瀏覽數先記（304 也算一次瀏覽），再看資料有沒有變；
+    # 記憶體只有列表欄位，內文要 render 時才讀（片段快取 → LRU 內文快取 → store）
+    return conditional(repair, lambda: render_template('detail.html', repair=repair,
+                                                       body=_detail_body(repair_fragments, repairs, repair),
+                                                       username=session.get('username'), role=session.get('role')))
 
 @app.route('/repair/<repair_id>/delete', methods=['POST'])
 def delete_repair(repair_id):
-    global repair_data
-    repair_data = [r for r in repair_data if r['id'] != repair_id]
-    with open(repairs_path, 'w', encoding='utf-8') as f:
-        json.dump(repair_data, f, ensure_ascii=False, indent=2)
+    repairs.remove(repair_id)
     return redirect(url_for('index'))
 
 @app.route('/login', methods=['GET', 'POST'])
@@ -203,32 +360,22 @@ def new_repair():
             'author': session['username'],
             'status': request.form['status'],
             'summary': request.form['summary'],
-            'details': request.form['details'],
+            # 內嵌的 base64 圖片先抽成 static/uploads/ 的檔案
+            'details': extract_images(request.form['details'], UPLOAD_DIR)[0],
             'views': 0
         }
+        # 列表卡片的封面圖（內文第一張上傳圖片）
+        new_entry['cover'] = first_upload(new_entry['details'])
 
         if is_tools:
-            tools_path = 'data/tools.json'
-            os.makedirs(os.path.dirname(tools_path), exist_ok=True)
-            if not os.path.exists(tools_path):
-                with open(tools_path, 'w', encoding='utf-8') as f:
-                    json.dump([], f)
-            with open(tools_path, encoding='utf-8') as f:
-                tools_data = json.load(f)
-            tools_data.insert(0, new_entry)
-            with open(tools_path, 'w', encoding='utf-8') as f:
-                json.dump(tools_data, f, ensure_ascii=False, indent=2)
+            tool_data.insert(new_entry)
         else:
-            repair_data.insert(0, new_entry)
-            with open(repairs_path, 'w', encoding='utf-8') as f:
-                json.dump(repair_data, f, ensure_ascii=False, indent=2)
+            repairs.insert(new_entry)
 
-        return redirect(url_for('index'))
-
-        # 發佈成功後刪除草稿
-        draft_path = 'data/drafts.json'
-        if os.path.exists(draft_path):
-            os.remove(draft_path)
+        # 發佈成功後只刪掉這份紀錄用的草稿（自己的），其他人的草稿不動
+        draft_id = (request.form.get('draft_id') or '').strip()
+        if draft_id:
+            store.drafts.delete(draft_id, owner=session['username'])
 
         return redirect(url_for('index'))
 
@@ -241,10 +388,11 @@ def too_large(e): return "Payload too large", 413
 def upload():
     f = request.files.get('file')
     if not f: return jsonify(error="no file"), 400
-    ext = os.path.splitext(f.filename or '')[1].lower()
-    name = f"{uuid.uuid4().hex}{ext or '.png'}"
-    path = os.path.join(UPLOAD_DIR, secure_filename(name))
-    f.save(path)
+    ext = os.path.splitext(secure_filename(f.filename or ''))[1].lower()
+    if not ext[1:].isalnum() or len(ext) > 6:
+        ext = '.png'
+    # 以內容雜湊命名：同一張圖重複上傳只存一份，縮圖在背景產生
+    name = save_stream(f.stream, ext, UPLOAD_DIR)
     return jsonify(url=url_for('static', filename=f'uploads/{name}'))
 
 @app.route('/new')
@@ -257,70 +405,23 @@ def new_page():
 def new_page_alias():
     return new_page()
 
-import os, json, time, uuid
-from flask import request, session, jsonify
-
-BASE_DIR = os.path.abspath(os.path.dirname(__file__))
-DRAFTS_FILE = os.path.join(BASE_DIR, 'data', 'drafts.json')
-
-def _ensure_drafts_file():
-    os.makedirs(os.path.join(BASE_DIR, 'data'), exist_ok=True)
-    if not os.path.exists(DRAFTS_FILE):
-        with open(DRAFTS_FILE, 'w', encoding='utf-8') as f:
-            f.write('{}')  # 預設 dict 形式：{ username: [ ... ] }
-
-def _load_all():
-    if not os.path.exists(os.path.join(BASE_DIR, 'data')):
-        os.makedirs(os.path.join(BASE_DIR, 'data'), exist_ok=True)
-    if not os.path.exists(DRAFTS_FILE):
-        return {}
-    try:
-        with open(DRAFTS_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except Exception:
-        return {}
-
-def _save_all(data):
-    _ensure_drafts_file()
-    with open(DRAFTS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-
 @app.route('/save_draft', methods=['POST'])
 def save_draft():
-    """相容舊前端：接收 {title, category, details}，自動補 id/owner/updated_at 後寫入"""
-    payload = request.get_json(force=True)
-    title    = (payload.get('title') or '').strip()
-    category = (payload.get('category') or '').strip()
-    details  = payload.get('details') or ''
+    """接收 {id?, title?, category?, details?}：帶 id 時只更新有送來的欄位；
+    舊前端只送 {title, category, details}，照舊另存一筆（內容和上次一樣則不寫）"""
+    payload = request.get_json(force=True) or {}
+    fields = {}
+    if 'title' in payload:
+        fields['title'] = (payload.get('title') or '').strip() or "(未命名草稿)"
+    if 'category' in payload:
+        fields['category'] = (payload.get('category') or '').strip()
+    if 'details' in payload:
+        fields['details'] = payload.get('details') or ''
 
     user = session.get('username') or 'anonymous'
-    now  = int(time.time())
-
-    draft = {
-        "id": str(uuid.uuid4()),
-        "owner": user,
-        "title": title or "(未命名草稿)",
-        "category": category,
-        "details": details,
-        "updated_at": now
-    }
-
-    data = _load_all()
-
-    # 支援三種儲存形態並盡量往 {username: [ ... ]} 收斂
-    if isinstance(data, dict) and 'drafts' in data and isinstance(data['drafts'], list):
-        # 早期若是 {"drafts":[...]} 就直接 append
-        data['drafts'].append(draft)
-    elif isinstance(data, dict):
-        data.setdefault(user, [])
-        data[user].append(draft)
-    elif isinstance(data, list):
-        data.append(draft)
-    else:
-        data = {user: [draft]}
-
-    _save_all(data)
-    return jsonify({"ok": True, "id": draft["id"]})
+    draft_id = str(payload.get('id') or '').strip() or None
+    draft, changed = store.drafts.save(user, fields, draft_id=draft_id)
+    return jsonify({"ok": True, "id": draft["id"], "changed": changed})
 
 @app.route('/load_draft', methods=['GET'])
 def load_draft():
@@ -328,104 +429,78 @@ def load_draft():
     新增：若帶 ?id=xxx，則回傳該草稿內容
     舊行為：沒帶 id 時，回傳「目前使用者最新一筆」，找不到則回全局最新，再不行回 {}
     """
-    data = _load_all()
     draft_id = request.args.get('id', '').strip()
     cur_user = session.get('username')
 
-    # 將資料展平成清單
-    def as_list(d):
-        items = []
-        if isinstance(d, dict) and 'drafts' in d and isinstance(d['drafts'], list):
-            items = d['drafts']
-        elif isinstance(d, dict) and all(k in d for k in ('title','category','details')):
-            items = [d]
-        elif isinstance(d, dict):
-            for owner, lst in d.items():
-                if isinstance(lst, list):
-                    items.extend(lst)
-        elif isinstance(d, list):
-            items = d
-        return items
-
-    items = as_list(data)
-
-    # ① 有 id：精準找
+    # ① 有 id：精準找（先找自己的草稿）
     if draft_id:
-        for it in items:
-            if str(it.get('id')) == draft_id or str(it.get('_id')) == draft_id:
-                return jsonify({
-                    "title": it.get("title") or "",
-                    "category": it.get("category") or "",
-                    "details": it.get("details") or ""
-                })
-        return jsonify({})  # 找不到
-
-    # ② 沒 id：回目前使用者最新一筆
-    if cur_user:
-        own = [x for x in items if (x.get('owner') == cur_user)]
-        own.sort(key=lambda x: x.get('updated_at') or 0, reverse=True)
-        if own:
-            latest = own[0]
-            return jsonify({
-                "title": latest.get("title") or "",
-                "category": latest.get("category") or "",
-                "details": latest.get("details") or ""
-            })
-
-    # ③ 退而求其次：全局最新
-    if items:
-        latest = sorted(items, key=lambda x: x.get('updated_at') or 0, reverse=True)[0]
-        return jsonify({
-            "title": latest.get("title") or "",
-            "category": latest.get("category") or "",
-            "details": latest.get("details") or ""
+        it = store.drafts.get(draft_id, owner=cur_user)
+        if it is None:
+            return conditional_json({})  # 找不到
+        return conditional_json({
+            "id": it.get("id") or "",
+            "title": it.get("title") or "",
+            "category": it.get("category") or "",
+            "details": it.get("details") or ""
         })
 
-    return jsonify({})
+    # ② 沒 id：回目前使用者最新一筆（查索引，不必讀所有人的草稿）
+    latest = store.drafts.latest(cur_user) if cur_user else None
+    # ③ 退而求其次：全局最新
+    if latest is None:
+        latest = store.drafts.latest()
+    if latest is None:
+        return conditional_json({})
+    return conditional_json({
+        "id": latest.get("id") or "",
+        "title": latest.get("title") or "",
+        "category": latest.get("category") or "",
+        "details": latest.get("details") or ""
+    })
+
+TOOL_LIST_FIELDS = ('id', 'title', 'date', 'author', 'category', 'tool_subcategory', 'views')
+
+def _tool_page():
+    """依日期新到舊取一頁工具紀錄；?sub= 篩選子分類"""
+    after, before, limit = _page_args()
+    sub = (request.args.get('sub') or 'all').lower()
+    keep = None
+    if sub != 'all':
+        keep = lambda t: (t.get('tool_subcategory') or 'general').lower() == sub
+    tool_data.refresh()
+    return tool_data.orders.page('date', 'desc', after=after, before=before, limit=limit, keep=keep)
 
 @app.route('/tools')
 def tools():
-    tools_path = 'data/tools.json'
-    tools_data = []
-    if os.path.exists(tools_path):
-        with open(tools_path, encoding='utf-8') as f:
-            tools_data = json.load(f)
-    return render_template('tools.html', tools=tools_data, username=session.get('username'), role=session.get('role'))
+    page = _tool_page()
+    next_url, prev_url = _page_links(page)
+    return conditional(page_state(page), lambda: render_template(
+        'tools.html', tools=page.rows, cards=_cards(tool_fragments, 'tool_card', page.rows),
+        username=session.get('username'), role=session.get('role'),
+        next_url=next_url, prev_url=prev_url))
+
+@app.route('/api/tools')
+def api_tools():
+    return _listing_json(_tool_page(), TOOL_LIST_FIELDS)
 
 @app.route('/tool/<tool_id>')
 def tool_detail(tool_id):
-    tools_path = 'data/tools.json'
-    if not os.path.exists(tools_path):
-        abort(404)
-    with open(tools_path, encoding='utf-8') as f:
-        tools_data = json.load(f)
-    tool = next((t for t in tools_data if t['id'] == tool_id), None)
+    tool = tool_data.get(tool_id)
     if not tool:
         abort(404)
 
-    if 'viewed_tools' not in session:
-        session['viewed_tools'] = []
-    if tool_id not in session['viewed_tools']:
-        session['viewed_tools'].append(tool_id)
-        session.modified = True
-        tool['views'] = tool.get('views', 0) + 1
-        with open(tools_path, 'w', encoding='utf-8') as f:
-            json.dump(tools_data, f, ensure_ascii=False, indent=2)
+    if first_view('tools', tool_id):
+        _count_view(tool_data, 'tools', tool)
 
-    return render_template('tool_detail.html', tool=tool, username=session.get('username'), role=session.get('role'))
+    return conditional(tool, lambda: render_template('tool_detail.html', tool=tool,
+                                                     body=_detail_body(tool_fragments, tool_data, tool),
+                                                     username=session.get('username'), role=session.get('role')))
 
 @app.route('/tool/<tool_id>/delete', methods=['POST'])
 def delete_tool(tool_id):
     if session.get('username') != 'admin':
         abort(403)
-    tools_path = 'data/tools.json'
-    if not os.path.exists(tools_path):
-        abort(404)
-    with open(tools_path, encoding='utf-8') as f:
-        tools_data = json.load(f)
-    tools_data = [t for t in tools_data if t['id'] != tool_id]
-    with open(tools_path, 'w', encoding='utf-8') as f:
-        json.dump(tools_data, f, ensure_ascii=False, indent=2)
+    tool_data.remove(tool_id)
     return redirect(url_for('tools'))
 
 if __name__ == '__main__':
@@ -0,0 +1,9 @@
+# catalog/__init__.py
+# 維修紀錄的記憶體內索引（全文檢索等），資料本身仍由 storage 保存
+from .search import SearchIndex, tokenize, strip_html
+from .orders import SortedOrders, SORT_FIELDS
+from .paging import Page, paginate, encode_cursor, decode_cursor
+from .records import RecordIndex
+from .cached import CachedCollection
+from .bodies import BodyCache
+from .hot import HotBoard
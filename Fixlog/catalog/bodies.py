@@ -0,0 +1,55 @@
+# catalog/bodies.py
+# 內文（details HTML）的 LRU 快取：列表常駐的只有列表欄位，
+# 內文在詳細頁用到時才向 store 讀，最近看過的留在記憶體
+import threading
+from collections import OrderedDict
+
+
+class BodyCache:
+    """loader(id) -> 內文；最多 max_items 筆、合計約 max_bytes（以字元數估算）"""
+
+    def __init__(self, loader, max_items=256, max_bytes=32 * 1024 * 1024):
+        self.loader = loader
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._items = OrderedDict()   # { id: 內文 }，最近用過的在後面
+        self._size = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, record_id):
+        with self._lock:
+            if record_id in self._items:
+                self._items.move_to_end(record_id)
+                return self._items[record_id]
+        body = self.loader(record_id)
+        self.put(record_id, body)
+        return body
+
+    def put(self, record_id, body):
+        size = len(body or '')
+        with self._lock:
+            self._discard(record_id)
+            if size > self.max_bytes:
+                return  # 單篇比整個快取還大：不快取
+            self._items[record_id] = body
+            self._size += size
+            while len(self._items) > self.max_items or self._size > self.max_bytes:
+                _, old = self._items.popitem(last=False)
+                self._size -= len(old or '')
+
+    def _discard(self, record_id):
+        old = self._items.pop(record_id, None)
+        if old is not None:
+            self._size -= len(old)
+
+    def discard(self, record_id):
+        with self._lock:
+            self._discard(record_id)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._size = 0
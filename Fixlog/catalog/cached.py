@@ -0,0 +1,144 @@
+# catalog/cached.py
+# 整份資料常駐記憶體，只有在 store 的變更戳記改變時才重新載入
+# （JSON 後端看檔案 mtime / 大小，SQLite 後端看 versions 表）
+# 多個 worker 同時跑時，每個 worker 每個請求檢查一次戳記（最多每 check_interval 秒），
+# 別的 worker 新增 / 刪除就整份重載，只改了瀏覽數就只補上瀏覽數
+import time, threading
+
+from storage.base import BODY_FIELD, split_body
+
+from .records import RecordIndex
+from .orders import SortedOrders
+from .search import SearchIndex
+from .bodies import BodyCache
+
+
+class CachedCollection:
+    """records：依 id 查詢；orders：預排順序（分頁用）；search：全文索引（search=True 時）
+
+    常駐的只有列表欄位（repo.all()），內文由 body() / full() 讀取並放進 LRU 快取。
+
+    check_interval 秒內最多檢查一次戳記，其餘請求完全不碰磁碟。
+    程式自己寫入時同步更新記憶體並記下新的戳記，不會觸發重新載入。
+    三個索引物件重載時就地換內容，外部持有的參照一直有效。
+    """
+
+    def __init__(self, repo, fold=None, check_interval=1.0, search=False, views=None, body_cache=256):
+        self.repo = repo
+        self.fold = fold or (lambda records: records)
+        # views(read)：read() 讀 store 的 { id: 瀏覽數 }，計數器加上尚未寫回的增量後回傳
+        # （由計數器決定怎麼讀才不會和壓實交錯、重複計入）
+        self.views = views or (lambda read: read())
+        self.check_interval = check_interval
+        self._lock = threading.RLock()
+        self._version = None
+        self._views_version = None
+        self._checked = 0.0
+        self.records = RecordIndex()
+        self.orders = SortedOrders()
+        self.search = SearchIndex(body=repo.body) if search else None
+        self.bodies = BodyCache(repo.body, max_items=body_cache)
+        # 資料變動的通知：fn(id, views_only)，整份重載時 id 為 None（例如清掉 render 好的片段）
+        self.listeners = []
+        self.reload()
+
+    def reload(self):
+        with self._lock:
+            version, views_version = self.repo.version(), self.repo.views_version()
+            items = self.fold(self.repo.all())
+            for r in items:
+                r.setdefault('views', 0)
+            self.bodies.clear()
+            self.records.reload(items)
+            self.orders.reload(items)
+            if self.search is not None:
+                self.search.reload(items)
+            self._version, self._views_version = version, views_version
+            self._checked = time.monotonic()
+            self._notify(None)
+
+    def _notify(self, record_id, views_only=False):
+        for fn in self.listeners:
+            fn(record_id, views_only)
+
+    def _apply_views(self):
+        """只有瀏覽數變了：逐筆補上，不重建索引"""
+        for rid, views in self.views(self.repo.views_map).items():
+            r = self.records.get(rid)
+            if r is None:
+                continue
+            views = views or 0
+            if r.get('views', 0) != views:
+                r['views'] = views
+                self.orders.touch_views(r)
+                self._notify(rid, views_only=True)
+
+    def refresh(self):
+        """戳記變了才重新載入；回傳是否有重新載入"""
+        now = time.monotonic()
+        if now - self._checked < self.check_interval:
+            return False
+        with self._lock:
+            self._checked = now
+            if self.repo.version() != self._version:
+                self.reload()
+                return True
+            views_version = self.repo.views_version()
+            if views_version != self._views_version:
+                self._views_version = views_version
+                self._apply_views()
+            return False
+
+    def _write(self, fn):
+        """自己寫入 store：repo.write() 在寫入鎖裡讀寫入前後的戳記，
+        寫入前的戳記和記憶體裡的一致（期間沒有別的 worker 改過）才記下新戳記；
+        不一致就不動，下一次 refresh 會重新載入，別人的修改不會被自己的戳記蓋過"""
+        result, before, after = self.repo.write(fn)
+        if before[0] == self._version:
+            self._version = after[0]
+        if before[1] == self._views_version:
+            self._views_version = after[1]
+        return result
+
+    def get(self, record_id):
+        self.refresh()
+        return self.records.get(record_id)
+
+    def body(self, record_id):
+        return self.bodies.get(record_id)
+
+    def full(self, record):
+        """列表欄位 + 內文（給詳細頁用的副本）"""
+        return dict(record, **{BODY_FIELD: self.body(record['id'])})
+
+    def insert(self, record):
+        """record 為完整紀錄；記憶體裡只留列表欄位"""
+        meta, body = split_body(record)
+        with self._lock:
+            self._write(lambda: self.repo.insert(record))
+            self.records.insert(meta)
+            self.orders.add(meta)
+            if self.search is not None:
+                self.search.add(meta, body=body)
+            self.bodies.put(meta['id'], body)
+            self._notify(meta['id'])
+
+    def remove(self, record_id):
+        with self._lock:
+            removed = self._write(lambda: self.repo.delete(record_id))
+            self.records.remove(record_id)
+            self.orders.remove(record_id)
+            if self.search is not None:
+                self.search.remove(record_id)
+            self.bodies.discard(record_id)
+            self._notify(record_id)
+            return removed
+
+    def touch_views(self, record, write=None):
+        """自己記了一次瀏覽：重新定位；計數器會直接改到 store 時（sync 模式）把那個動作當成 write 傳進來，
+        在這裡執行才能記下戳記，不必因此重載"""
+        with self._lock:
+            if write is not None:
+                self._write(write)
+            self.orders.touch_views(record)
+            self._notify(record['id'], views_only=True)
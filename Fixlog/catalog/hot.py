@@ -0,0 +1,155 @@
+# catalog/hot.py
+# 熱門排行榜：依「隨時間衰減的瀏覽數」排名，前 top_n 名（且分數夠高）就是熱門文章
+#
+# 每次瀏覽的權重隨時間減半（half_life 秒後剩一半）。實作上用「前向衰減」：
+# 一次在時間 t 的瀏覽記成 2^((t - t0) / half_life)，分數只會往上加、不必每秒重算全部；
+# 同一個時間點所有分數乘上同一個比例，排名不受影響，要和門檻比較時才換算成現在的值。
+#
+# 本行程的瀏覽用 bump() 當場加分；別的 worker 的瀏覽（重載後的 views 增量）由背景執行緒每 interval 秒補上。
+# 各分類也各有自己的前幾名（top_by），分類頁置頂用。請求裡只讀 top / top_by / hot_ids，都是事先算好的。
+import time, heapq, threading, atexit
+from datetime import datetime
+
+
+class HotBoard:
+    """source() 回傳目前所有紀錄（列表欄位，含 views、date 與 category）"""
+
+    def __init__(self, source, half_life=72 * 3600, top_n=3, min_score=1.0, interval=5.0, start=True):
+        self.source = source
+        self.half_life = half_life
+        self.top_n = top_n
+        self.min_score = min_score
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._t0 = time.time()
+        self._score = {}            # { id: 前向衰減分數（以 t0 為基準） }
+        self._seen = {}             # { id: 已計入的瀏覽數 }
+        self._category = {}         # { id: 分類 }
+        self.top = ()               # 前 top_n 名的 id，分數高到低
+        self.top_by = {}            # { 分類: 該分類前 top_n 名的 id }
+        self.hot_ids = frozenset()  # top 裡目前分數 >= min_score 的
+        self.sync()
+        self._wake = threading.Event()
+        self._stop = False
+        self._thread = None
+        if start and interval:
+            self._thread = threading.Thread(target=self._run, name='hot-board', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _weight(self, t):
+        return 2.0 ** ((t - self._t0) / self.half_life)
+
+    def score(self, record_id, now=None):
+        """目前（已衰減）的分數"""
+        now = time.time() if now is None else now
+        return self._score.get(record_id, 0.0) / self._weight(now)
+
+    @staticmethod
+    def _posted(record):
+        try:
+            return datetime.strptime(record['date'], '%Y-%m-%d %H:%M').timestamp()
+        except Exception:
+            return None  # 日期格式錯誤：既有的瀏覽數不計
+
+    def _rerank(self, top, record_id, s):
+        """分數只增不減：只有 record_id 自己可能擠進（或在）前幾名；top_n 為 0（關掉熱門標記）時一直是空的"""
+        if self.top_n and (record_id in top or len(top) < self.top_n or s > self._score.get(top[-1], 0.0)):
+            candidates = set(top)
+            candidates.add(record_id)
+            top = sorted(candidates, key=lambda i: self._score.get(i, 0.0), reverse=True)[:self.top_n]
+        return tuple(top)
+
+    def top_among(self, ids):
+        """一群紀錄（例如搜尋結果）裡分數最高的前 top_n 名；沒有分數的不算"""
+        with self._lock:
+            return heapq.nlargest(self.top_n, (i for i in ids if i in self._score), key=self._score.get)
+
+    def _publish(self, top, now, top_by=None):
+        floor = self.min_score * self._weight(now)
+        self.top = tuple(top)
+        if top_by is not None:
+            self.top_by = top_by
+        self.hot_ids = frozenset(i for i in top if self._score.get(i, 0.0) >= floor)
+
+    def bump(self, record, now=None):
+        """本行程剛記了瀏覽（record['views'] 已加上）：當場加分，排名只和目前的前幾名比較
+
+        和 sync() 一樣以 record['views'] 與已計入的數字的差額加分：
+        sync() 剛好在「views 加一」和 bump() 之間跑過的話，差額已經是 0，不會重複計入。
+        """
+        now = time.time() if now is None else now
+        record_id = record['id']
+        with self._lock:
+            views = record.get('views', 0) or 0
+            last = self._seen.get(record_id)
+            n = views - last if last is not None else 1  # 還沒同步過的新紀錄：只算這一次
+            self._seen[record_id] = views
+            if n <= 0:
+                return
+            s = self._score.get(record_id, 0.0) + n * self._weight(now)
+            self._score[record_id] = s
+            category = self._category[record_id] = record.get('category')
+            top_by = dict(self.top_by)  # 換一份新的，請求裡讀的不必拿鎖
+            top_by[category] = self._rerank(top_by.get(category, ()), record_id, s)
+            self._publish(self._rerank(self.top, record_id, s), now, top_by)
+
+    def sync(self, now=None):
+        """背景：補上別的 worker 的瀏覽、移除已刪除的紀錄、重排前幾名"""
+        now = time.time() if now is None else now
+        records = list(self.source())
+        with self._lock:
+            if (now - self._t0) / self.half_life > 64:
+                # 權重越來越大，換一個基準點（所有分數乘同一個比例，排名不變）
+                scale = 1.0 / self._weight(now)
+                self._score = {i: s * scale for i, s in self._score.items()}
+                self._t0 = now
+            ids = set()
+            for r in records:
+                rid = r['id']
+                ids.add(rid)
+                self._category[rid] = r.get('category')
+                views = r.get('views', 0) or 0
+                last = self._seen.get(rid)
+                if last is None:
+                    # 第一次看到：既有瀏覽數當作在發文時發生（發文越久分數越低）
+                    posted = self._posted(r)
+                    if views and posted is not None:
+                        self._score[rid] = views * self._weight(min(posted, now))
+                elif views > last:
+                    self._score[rid] = self._score.get(rid, 0.0) + (views - last) * self._weight(now)
+                # 只往上記：重載回來的數字偶爾會比 bump() 記下的小，往回記的話下次會重複計入
+                self._seen[rid] = views if last is None else max(views, last)
+            for rid in list(self._score):
+                if rid not in ids:
+                    del self._score[rid]
+            for rid in list(self._seen):
+                if rid not in ids:
+                    del self._seen[rid]
+            for rid in list(self._category):
+                if rid not in ids:
+                    del self._category[rid]
+            groups = {}
+            for rid in self._score:
+                groups.setdefault(self._category.get(rid), []).append(rid)
+            top_by = {c: tuple(heapq.nlargest(self.top_n, g, key=self._score.get)) for c, g in groups.items()}
+            top = heapq.nlargest(self.top_n, self._score, key=self._score.get)
+            self._publish(top, now, top_by)
+
+    def _run(self):
+        while not self._stop:
+            self._wake.wait(self.interval)
+            if self._stop:
+                break
+            try:
+                self.sync()
+            except Exception:
+                time.sleep(1)  # 不讓背景執行緒因例外而結束
+
+    def close(self):
+        if self._stop:
+            return
+        self._stop = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
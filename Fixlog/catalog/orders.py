@@ -0,0 +1,166 @@
+# catalog/orders.py
+# 預先排好的列表順序（標題 / 日期 / 瀏覽數），新增、刪除、瀏覽時就地更新
+# 列表頁只要沿著現成的順序取資料，不必每個請求重新排序
+import bisect, itertools, threading
+
+from .paging import paginate
+
+# 網址的 sort 參數 → 排序欄位
+SORT_FIELDS = {'alpha': 'title', 'date': 'date', 'views': 'views'}
+
+_KEY_FUNCS = {
+    'title': lambda r: r.get('title') or '',
+    'date': lambda r: r.get('date') or '',
+    'views': lambda r: r.get('views', 0),
+}
+
+
+class SortedOrders:
+    def __init__(self, records=()):
+        self._lock = threading.RLock()
+        self._build(records)
+
+    def _build(self, records):
+        docs = {}   # { id: record }
+        all_keys = {}   # { id: { field: key } }
+        # 每個欄位一條由小到大的 (key, id)；同鍵以 id 決定先後，
+        # 這樣分頁游標在不同 worker / 重啟後仍然指向同一個位置
+        lists = {f: [] for f in _KEY_FUNCS}
+        for r in records:
+            rid = r['id']
+            docs[rid] = r
+            keys = all_keys[rid] = {}
+            for f, fn in _KEY_FUNCS.items():
+                keys[f] = fn(r)
+                lists[f].append((keys[f], rid))
+        for lst in lists.values():
+            lst.sort()
+        self._docs, self._keys, self._lists = docs, all_keys, lists
+
+    def reload(self, records):
+        """整份重建；走訪中的 iter() 仍看舊清單，不受影響"""
+        with self._lock:
+            self._build(records)
+
+    def __len__(self):
+        return len(self._docs)
+
+    def get(self, record_id):
+        return self._docs.get(record_id)
+
+    def _unlink(self, lst, entry):
+        i = bisect.bisect_left(lst, entry)
+        if i < len(lst) and lst[i] == entry:
+            del lst[i]
+
+    def add(self, record):
+        with self._lock:
+            rid = record['id']
+            if rid in self._docs:
+                self.remove(rid)
+            self._docs[rid] = record
+            keys = self._keys[rid] = {}
+            for f, fn in _KEY_FUNCS.items():
+                keys[f] = fn(record)
+                bisect.insort(self._lists[f], (keys[f], rid))
+
+    def remove(self, record_id):
+        with self._lock:
+            keys = self._keys.pop(record_id, None)
+            if keys is None:
+                return
+            del self._docs[record_id]
+            for f, k in keys.items():
+                self._unlink(self._lists[f], (k, record_id))
+
+    def update(self, record, fields=None):
+        """紀錄內容變動後重新定位；fields 只更新指定欄位（例如瀏覽數）"""
+        rid = record['id']
+        with self._lock:
+            keys = self._keys.get(rid)
+            if keys is None:
+                return
+            for f in fields or _KEY_FUNCS:
+                old = keys[f]
+                new = _KEY_FUNCS[f](record)
+                if new == old:
+                    continue
+                self._unlink(self._lists[f], (old, rid))
+                bisect.insort(self._lists[f], (new, rid))
+                keys[f] = new
+
+    def touch_views(self, record):
+        self.update(record, fields=('views',))
+
+    def iter(self, field, desc=False):
+        """沿著某欄位的順序產生紀錄
+
+        直接以索引走訪現有清單、不複製，所以只取前幾筆是 O(k)；
+        走訪途中若有其他請求新增 / 刪除，可能略過或重複一筆，對列表頁無妨。
+        """
+        lst = self._lists[field]
+        docs = self._docs
+        i = 0
+        while True:
+            try:
+                entry = lst[-1 - i] if desc else lst[i]
+            except IndexError:
+                return
+            i += 1
+            r = docs.get(entry[1])
+            if r is not None:
+                yield r
+
+    def _entries(self, field, subset):
+        """整體排序，或是子集合（搜尋結果）自己的排序"""
+        if subset is None:
+            return self._lists[field]
+        with self._lock:
+            return sorted((self._keys[r['id']][field], r['id']) for r in subset if r['id'] in self._keys)
+
+    @staticmethod
+    def _keep(category):
+        if not category:
+            return None
+        return lambda r: r.get('category') == category
+
+    def page(self, sort, order='desc', category=None, subset=None, after=None, before=None, limit=20, keep=None):
+        """keep 為額外的篩選條件（例如工具子分類），優先於 category"""
+        field = SORT_FIELDS[sort]
+        # 筆畫排序一律由小到大（與原本行為一致）
+        desc = (order == 'desc') and sort != 'alpha'
+        return paginate(self._entries(field, subset), self._docs.get, desc=desc,
+                        after=after, before=before, limit=limit, keep=keep or self._keep(category))
+
+    def hot(self, category=None, subset=None, top=3):
+        """瀏覽數前 top 名，O(top)"""
+        if subset is not None:
+            return sorted(subset, key=lambda r: r.get('views', 0), reverse=True)[:top]
+        keep = self._keep(category) or (lambda r: True)
+        return list(itertools.islice((r for r in self.iter('views', desc=True) if keep(r)), top))
+
+    def default_page(self, category=None, subset=None, after=None, before=None, limit=20, top=3, hot=None):
+        """預設排序：熱門 + 其餘依日期新到舊；熱門只出現在第一頁
+
+        hot 為置頂的紀錄（呼叫端已依分類 / 搜尋結果篩過，例如熱門排行榜）；沒給就用累計瀏覽數前 top 名。
+        """
+        if hot is None:
+            hot = self.hot(category=category, subset=subset, top=top)
+        hot_ids = {r['id'] for r in hot}
+        base = self._keep(category)
+
+        def keep(r):
+            return r['id'] not in hot_ids and (base is None or base(r))
+
+        entries = self._entries('date', subset)
+        if after is None and before is None:
+            p = paginate(entries, self._docs.get, desc=True, limit=max(limit - len(hot), 1), keep=keep)
+            p.rows = hot + p.rows
+            return p
+        p = paginate(entries, self._docs.get, desc=True, after=after, before=before, limit=limit, keep=keep)
+        if before is not None and not p.has_prev:
+            # 往回翻到頭了：第一頁要帶熱門，直接回第一頁
+            return self.default_page(category=category, subset=subset, limit=limit, top=top, hot=hot)
+        if after is not None and not p.rows:
+            p.has_prev = True
+        return p
@@ -0,0 +1,78 @@
+# catalog/paging.py
+# 游標（keyset）分頁：游標記住上一頁最後一筆的 (排序鍵, id)，
+# 下一頁從那個位置用 bisect 接著走，第幾頁的成本都一樣
+import base64, bisect, json
+
+
+def encode_cursor(entry):
+    raw = json.dumps(list(entry), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """壞掉的游標一律當成沒帶（回第一頁）"""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        key, rid = json.loads(raw.decode('utf-8'))
+        return (key, rid)
+    except Exception:
+        return None
+
+
+class Page:
+    def __init__(self, rows, next_cursor=None, prev_cursor=None, has_next=False, has_prev=False):
+        self.rows = rows
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor  # has_prev 但沒有游標時，上一頁就是第一頁
+        self.has_next = has_next
+        self.has_prev = has_prev
+
+
+def _walk(entries, desc, cursor):
+    """從游標之後（不含）依方向產生 entry；entries 由小到大排好"""
+    if cursor is None:
+        i = len(entries) - 1 if desc else 0
+    else:
+        try:
+            i = bisect.bisect_left(entries, cursor) - 1 if desc else bisect.bisect_right(entries, cursor)
+        except TypeError:
+            return  # 游標的鍵型別與這個排序不合
+    step = -1 if desc else 1
+    while i >= 0:
+        try:
+            entry = entries[i]
+        except IndexError:
+            return
+        yield entry
+        i += step
+
+
+def paginate(entries, resolve, desc=True, after=None, before=None, limit=20, keep=None):
+    """entries: 由小到大的 [(key, id), ...]；resolve: id -> record（找不到回 None）
+
+    keep(record) 回傳 False 的紀錄會被略過（分類篩選、搜尋子集合等）。
+    """
+    backwards = before is not None
+    got = []
+    for entry in _walk(entries, desc != backwards, before if backwards else after):
+        r = resolve(entry[1])
+        if r is None or (keep is not None and not keep(r)):
+            continue
+        got.append((entry, r))
+        if len(got) > limit:
+            break
+    more = len(got) > limit
+    got = got[:limit]
+    if backwards:
+        got.reverse()
+        has_prev, has_next = more, True
+    else:
+        has_prev, has_next = after is not None, more
+    if not got:
+        return Page([], has_prev=has_prev)
+    return Page([r for _, r in got],
+                next_cursor=encode_cursor(got[-1][0]) if has_next else None,
+                prev_cursor=encode_cursor(got[0][0]) if has_prev else None,
+                has_next=has_next, has_prev=has_prev)
@@ -0,0 +1,45 @@
+# catalog/records.py
+# id → 紀錄 的雜湊索引；走訪順序與原本的清單相同（新到舊）
+import threading
+
+
+class RecordIndex:
+    """取代原本的 list：查詢、新增、刪除都是 O(1)
+
+    內部 dict 依插入順序由舊到新，走訪時反過來，所以第一筆仍是最新的。
+    """
+
+    def __init__(self, records=()):
+        self._lock = threading.Lock()
+        self._by_id = {}
+        self.reload(records)
+
+    def reload(self, records):
+        """整批換成新的資料（records 第 0 筆是最新的）"""
+        by_id = {}
+        for r in reversed(list(records)):
+            by_id[r['id']] = r
+        with self._lock:
+            self._by_id = by_id
+
+    def get(self, record_id):
+        return self._by_id.get(record_id)
+
+    def __contains__(self, record_id):
+        return record_id in self._by_id
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __iter__(self):
+        return reversed(list(self._by_id.values()))
+
+    def insert(self, record):
+        """新增（或覆寫）一筆，排在最前面"""
+        with self._lock:
+            self._by_id.pop(record['id'], None)
+            self._by_id[record['id']] = record
+
+    def remove(self, record_id):
+        with self._lock:
+            return self._by_id.pop(record_id, None)
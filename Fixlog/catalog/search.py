@@ -0,0 +1,187 @@
+# catalog/search.py
+# 倒排索引：標題、摘要、內文（去除 HTML）
+#   中文以「字元二元組」(bigram) 切詞，英數以單字切詞
+#   英數查詢詞也比對字首（print 找得到 printer）：英數詞另外存一份排序好的清單，用 bisect 找出同字首的範圍
+#   新增 / 刪除紀錄時增量更新，查詢只看命中的 posting list
+import re, math, threading
+from bisect import bisect_left, insort
+from html import unescape
+
+_TAG_RE = re.compile(r'<[^>]*>')
+_SCRIPT_RE = re.compile(r'<(script|style)\b.*?</\1>', re.S | re.I)
+_TOKEN_RE = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+|[0-9a-z]+')
+_CJK_RE = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]')
+
+# 欄位權重：標題命中比內文重要
+FIELD_WEIGHTS = (('title', 3.0), ('summary', 2.0), ('details', 1.0))
+
+# 字首比對：查詢詞至少這麼長才展開（太短會展開成大半個詞彙表）；只是字首相符的詞權重打折，完全相符的排前面
+PREFIX_MIN = 2
+PREFIX_WEIGHT = 0.5
+
+
+def strip_html(html):
+    if not html:
+        return ''
+    text = _SCRIPT_RE.sub(' ', html)
+    text = _TAG_RE.sub(' ', text)  # 內嵌圖片的 data URI 在標籤裡，會一起去掉
+    return unescape(text)
+
+
+def tokenize(text):
+    terms = []
+    for run in _TOKEN_RE.findall((text or '').lower()):
+        if _CJK_RE.match(run):
+            if len(run) == 1:
+                terms.append(run)
+            else:
+                terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            terms.append(run)
+    return terms
+
+
+def _same_fields(a, b):
+    """兩份列表欄位除了瀏覽數以外都一樣"""
+    return len(a.keys() - {'views'}) == len(b.keys() - {'views'}) and all(
+        v == b.get(k) for k, v in a.items() if k != 'views')
+
+
+class SearchIndex:
+    """body(id) -> 內文：紀錄本身不含內文（只有列表欄位）時用來讀內文建索引，讀完不保留"""
+
+    def __init__(self, records=(), body=None):
+        self.body = body
+        self._lock = threading.RLock()
+        self._postings = {}   # { term: { id: 加權詞頻 } }
+        self._docs = {}       # { id: (record, (term, ...)) }，查詢回傳與刪除時用
+        self._latin = []      # 所有英數詞，排序好的（字首比對用）
+        self._by_char = {}    # { 中文字: {含這個字的 bigram} }，單字查詢用
+        for r in records:
+            self.add(r)
+
+    def reload(self, records):
+        """其他 worker 改了資料時同步（物件本身不換，別處持有的參照仍有效）
+
+        只處理有變的紀錄：不見了的移除，新的或列表欄位變了的重新建索引（才需要讀內文），
+        其餘沿用原本的詞，只換成新的紀錄物件，不必把每篇內文重新讀一次。
+        本程式不會只改內文而不動列表欄位，外部只改內文檔的話要重啟才會反映在搜尋上。
+        """
+        with self._lock:
+            seen = set()
+            for r in records:
+                rid = r['id']
+                seen.add(rid)
+                doc = self._docs.get(rid)
+                if doc is not None and _same_fields(doc[0], r):
+                    self._docs[rid] = (r, doc[1])
+                else:
+                    self.add(r)
+            for rid in [rid for rid in self._docs if rid not in seen]:
+                self.remove(rid)
+
+    def __len__(self):
+        return len(self._docs)
+
+    def add(self, record, body=None):
+        """body：另外給的內文（record 只有列表欄位時）"""
+        rid = record['id']
+        tf = {}
+        for field, weight in FIELD_WEIGHTS:
+            if field == 'details':
+                if body is not None:
+                    text = body
+                elif field in record or self.body is None:
+                    text = record.get(field)
+                else:
+                    text = self.body(rid)
+                text = strip_html(text)
+            else:
+                text = record.get(field) or ''
+            for t in tokenize(text):
+                tf[t] = tf.get(t, 0.0) + weight
+        with self._lock:
+            self.remove(rid)
+            for t, w in tf.items():
+                plist = self._postings.get(t)
+                if plist is None:
+                    plist = self._postings[t] = {}
+                    if not _CJK_RE.match(t):
+                        insort(self._latin, t)
+                    elif len(t) == 2:
+                        for ch in set(t):
+                            self._by_char.setdefault(ch, set()).add(t)
+                plist[rid] = w
+            self._docs[rid] = (record, tuple(tf))
+
+    def remove(self, record_id):
+        with self._lock:
+            doc = self._docs.pop(record_id, None)
+            if not doc:
+                return
+            terms = doc[1]
+            for t in terms:
+                plist = self._postings.get(t)
+                if plist is None:
+                    continue
+                plist.pop(record_id, None)
+                if not plist:
+                    del self._postings[t]
+                    if not _CJK_RE.match(t):
+                        i = bisect_left(self._latin, t)
+                        if i < len(self._latin) and self._latin[i] == t:
+                            del self._latin[i]
+                    elif len(t) == 2:
+                        for ch in set(t):
+                            bigrams = self._by_char.get(ch)
+                            if bigrams is not None:
+                                bigrams.discard(t)
+                                if not bigrams:
+                                    del self._by_char[ch]
+
+    def _postings_for(self, term):
+        # 單一中文字：bigram 索引裡沒有單字，改併入所有含這個字的詞（_by_char 直接查到，不必掃整個詞彙表）
+        if len(term) == 1 and _CJK_RE.match(term):
+            merged = dict(self._postings.get(term, {}))
+            for t in self._by_char.get(term, ()):
+                for rid, w in self._postings[t].items():
+                    merged[rid] = merged.get(rid, 0.0) + w
+            return merged
+        if len(term) >= PREFIX_MIN and not _CJK_RE.match(term):
+            # 英數：完全相符的詞 + 以它開頭的詞（排序清單裡連續的一段）
+            merged = dict(self._postings.get(term, {}))
+            i = bisect_left(self._latin, term)
+            while i < len(self._latin) and self._latin[i].startswith(term):
+                t = self._latin[i]
+                i += 1
+                if t == term:
+                    continue
+                for rid, w in self._postings[t].items():
+                    merged[rid] = merged.get(rid, 0.0) + w * PREFIX_WEIGHT
+            return merged
+        return self._postings.get(term, {})
+
+    def search(self, query, limit=None):
+        """回傳依相關度排序的紀錄；所有查詢詞都要命中"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        with self._lock:
+            plists = sorted((self._postings_for(t) for t in terms), key=len)
+            if not plists[0]:
+                return []
+            n = len(self._docs) or 1
+            candidates = set(plists[0])
+            for plist in plists[1:]:
+                candidates.intersection_update(plist)
+                if not candidates:
+                    return []
+            scores = dict.fromkeys(candidates, 0.0)
+            for plist in plists:
+                idf = math.log(1 + n / len(plist))
+                for rid in candidates:
+                    scores[rid] += plist[rid] * idf
+            ranked = sorted(scores, key=scores.get, reverse=True)
+            if limit:
+                ranked = ranked[:limit]
+            return [self._docs[rid][0] for rid in ranked]
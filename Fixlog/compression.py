@@ -0,0 +1,163 @@
+# compression.py
+# 回應壓縮：HTML / JSON 超過 min_size 就依 Accept-Encoding 壓縮（有裝 brotli 優先用 br，否則 gzip）
+#   大於 stream_size 的回應、以及本來就是串流的回應，改成邊壓邊送，不用先在記憶體裡壓完整份
+#   static/ 底下的文字檔（css / js / svg / ico…）啟動時先壓好 .br / .gz，請求時直接送壓好的檔案
+#
+#   FIXLOG_COMPRESS=0 關閉；FIXLOG_COMPRESS_MIN 為最小壓縮大小（位元組，預設 1024）
+import os, gzip, zlib, mimetypes
+
+from flask import request, send_from_directory
+from werkzeug.security import safe_join
+
+from storage.writer import atomic_write
+
+try:
+    import brotli
+except ImportError:  # brotli 是選配，沒裝就只用 gzip
+    brotli = None
+
+COMPRESSIBLE = {
+    'text/html', 'text/plain', 'text/css', 'text/javascript', 'text/xml',
+    'application/json', 'application/javascript', 'application/xml',
+    'image/svg+xml', 'image/x-icon', 'image/vnd.microsoft.icon',
+}
+# 啟動時預先壓縮的副檔名（圖片等本身已壓縮的不處理）
+STATIC_EXTS = ('.html', '.css', '.js', '.mjs', '.json', '.svg', '.txt', '.ico', '.map', '.xml')
+SUFFIX = {'br': '.br', 'gzip': '.gz'}
+
+_CHUNK = 64 * 1024
+
+
+def pick_encoding(accept):
+    """accept 為 request.accept_encodings（已解析好的 q 值）：可用的編碼裡挑 q 最高的，同分 br 優先；
+    q=0 代表明確不接受（例如 gzip;q=0, identity），都不接受就回 None、不壓縮"""
+    best, best_q = None, 0
+    for encoding in ('br', 'gzip'):
+        if encoding == 'br' and brotli is None:
+            continue
+        q = accept.quality(encoding)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def _compressor(encoding, level):
+    if encoding == 'br':
+        c = brotli.Compressor(quality=min(level, 11))
+        return c.process, c.finish
+    c = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31：gzip 格式
+    return c.compress, c.flush
+
+
+def compress(data, encoding, level=6):
+    if encoding == 'br':
+        return brotli.compress(data, quality=min(level, 11))
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def compress_stream(chunks, encoding, level=6):
+    """邊壓邊送：每收到一段就吐出目前壓好的部分"""
+    process, finish = _compressor(encoding, level)
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        out = process(chunk)
+        if out:
+            yield out
+    yield finish()
+
+
+def _slices(data):
+    for i in range(0, len(data), _CHUNK):
+        yield data[i:i + _CHUNK]
+
+
+def precompress_static(folder, min_size=1024, skip=('uploads',)):
+    """static/ 底下的文字檔壓成 .br / .gz（已是最新的略過）；回傳產生的檔案數"""
+    made = 0
+    if not folder or not os.path.isdir(folder):
+        return made
+    for root, dirs, files in os.walk(folder):
+        if root == folder:
+            dirs[:] = [d for d in dirs if d not in skip]
+        for name in files:
+            if not name.lower().endswith(STATIC_EXTS):
+                continue
+            src = os.path.join(root, name)
+            st = os.stat(src)
+            if st.st_size < min_size:
+                continue
+            data = None
+            for encoding, suffix in SUFFIX.items():
+                if encoding == 'br' and brotli is None:
+                    continue
+                dst = src + suffix
+                if os.path.exists(dst) and os.stat(dst).st_mtime_ns >= st.st_mtime_ns:
+                    continue
+                if data is None:
+                    with open(src, 'rb') as f:
+                        data = f.read()
+                packed = compress(data, encoding, level=11 if encoding == 'br' else 9)
+                if len(packed) < len(data) * 0.9:  # 壓不太小的就不值得
+                    atomic_write(dst, packed)  # 權限照 umask（不是 mkstemp 的 0600），網頁伺服器才讀得到
+                    made += 1
+    return made
+
+
+def init_app(app, min_size=None, stream_size=256 * 1024, level=6):
+    if os.environ.get('FIXLOG_COMPRESS', '1').strip().lower() in ('0', 'false', 'no', 'off'):
+        return
+    if min_size is None:
+        min_size = int(os.environ.get('FIXLOG_COMPRESS_MIN', 1024))
+    precompress_static(app.static_folder, min_size)
+
+    @app.after_request
+    def _compress_response(resp):
+        if (resp.status_code < 200 or resp.status_code in (204, 206, 304) or resp.direct_passthrough
+                or 'Content-Encoding' in resp.headers or resp.mimetype not in COMPRESSIBLE):
+            return resp
+        resp.vary.add('Accept-Encoding')
+        encoding = pick_encoding(request.accept_encodings)
+        if encoding is None:
+            return resp
+        if resp.is_streamed:
+            resp.response = compress_stream(resp.response, encoding, level)
+        else:
+            data = resp.get_data()
+            if len(data) < min_size:
+                return resp
+            if len(data) >= stream_size:
+                resp.response = compress_stream(_slices(data), encoding, level)
+            else:
+                resp.set_data(compress(data, encoding, level))
+        if resp.is_streamed:
+            resp.headers.pop('Content-Length', None)
+        resp.headers['Content-Encoding'] = encoding
+        return resp
+
+    # static：有預先壓好、而且比原檔新的 .br / .gz 就直接送
+    serve_static = app.view_functions['static']
+
+    def static(filename):
+        encoding = pick_encoding(request.accept_encodings)
+        if encoding is not None:
+            src = safe_join(app.static_folder, filename)
+            if src and os.path.isfile(src):
+                variant = src + SUFFIX[encoding]
+                try:
+                    fresh = os.stat(variant).st_mtime_ns >= os.stat(src).st_mtime_ns
+                except OSError:
+                    fresh = False
+                if fresh:
+                    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+                    resp = send_from_directory(app.static_folder, filename + SUFFIX[encoding],
+                                               mimetype=mimetype, max_age=app.get_send_file_max_age(filename))
+                    resp.headers['Content-Encoding'] = encoding
+                    resp.vary.add('Accept-Encoding')
+                    return resp
+        resp = serve_static(filename=filename)
+        if resp.mimetype in COMPRESSIBLE:
+            resp.vary.add('Accept-Encoding')
+        return resp
+
+    app.view_functions['static'] = static
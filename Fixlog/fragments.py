@@ -0,0 +1,73 @@
+# fragments.py
+# 已 render 的 HTML 片段快取（列表卡片、詳細頁內文）
+#
+# 鍵的格式為 (種類, 紀錄 id, 其他會影響輸出的值…)，例如 ('card', id, 瀏覽數, 熱門, 管理員)；
+# 瀏覽數等變了鍵就不同，舊片段再也不會被用到，invalidate(id) 把它們提早清掉。
+# 依最近使用淘汰（LRU），片段數與總字元數都有上限。
+import threading
+from collections import OrderedDict
+
+from markupsafe import Markup
+
+
+class FragmentCache:
+    def __init__(self, max_items=2000, max_bytes=16 * 1024 * 1024):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._items = OrderedDict()   # { key: Markup }，最近用過的在後面
+        self._by_id = {}              # { 紀錄 id: {key, ...} }，invalidate 用
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def render(self, key, build, cacheable=True):
+        """有快取就直接回傳，沒有就 build() 並存起來；cacheable=False 時只 render 不存"""
+        with self._lock:
+            html = self._items.get(key)
+            if html is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return html
+            self.misses += 1
+        html = Markup(build())
+        if cacheable:
+            self._put(key, html)
+        return html
+
+    def _put(self, key, html):
+        with self._lock:
+            self._drop(key)
+            if len(html) > self.max_bytes:
+                return
+            self._items[key] = html
+            self._by_id.setdefault(key[1], set()).add(key)
+            self._size += len(html)
+            while len(self._items) > self.max_items or self._size > self.max_bytes:
+                self._drop(next(iter(self._items)))
+
+    def _drop(self, key):
+        html = self._items.pop(key, None)
+        if html is None:
+            return
+        self._size -= len(html)
+        keys = self._by_id.get(key[1])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_id[key[1]]
+
+    def invalidate(self, record_id=None, kind=None):
+        """清掉某筆紀錄的片段（kind 只清那一種）；record_id 為 None 時全部清掉"""
+        with self._lock:
+            if record_id is None:
+                self._items.clear()
+                self._by_id.clear()
+                self._size = 0
+                return
+            for key in list(self._by_id.get(record_id, ())):
+                if kind is None or key[0] == kind:
+                    self._drop(key)
@@ -0,0 +1,57 @@
+# httpcache.py
+# 條件式 GET：以「這個回應用到的資料」算 ETag，瀏覽器帶 If-None-Match 且相符就回 304，
+# 不必重新 render 樣板、也不必重傳整頁（內文可能有好幾 MB）。
+#
+# ETag 只由資料本身（紀錄的列表欄位、瀏覽數、草稿內容…）加上登入身分與樣板版本組成，
+# 不含行程內的計數器，所以多個 worker 對同一份資料算出來的 ETag 相同。
+# 一律加上 Cache-Control: private, no-cache —— 每次都要回來驗證，且不給共用快取存。
+import os, hashlib
+
+from flask import current_app, jsonify, make_response, request, session
+
+from storage import codec
+
+_TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+
+
+def _templates_stamp():
+    """樣板改了（重新部署）舊的 ETag 就要失效；同一份部署的每個 worker 算出來都一樣"""
+    h = hashlib.sha1()
+    for root, _, files in os.walk(_TEMPLATES_DIR):
+        for name in sorted(files):
+            if name.endswith('.html'):
+                path = os.path.join(root, name)
+                h.update(f'{os.path.relpath(path, _TEMPLATES_DIR)}:{os.stat(path).st_mtime_ns};'.encode('utf-8'))
+    return h.hexdigest()[:12]
+
+
+TEMPLATES_STAMP = _templates_stamp()
+
+
+def etag_for(data):
+    """data：任何可轉成 JSON 的東西；同一份資料 + 同一個登入身分 → 同一個 ETag"""
+    payload = codec.dumps([TEMPLATES_STAMP, session.get('username'), session.get('role'), data], default=str)
+    return hashlib.sha1(payload).hexdigest()[:27]
+
+
+def conditional(data, build):
+    """ETag 相符回 304（不呼叫 build），否則回 build() 的結果並附上 ETag"""
+    etag = etag_for(data)
+    if request.if_none_match.contains_weak(etag):
+        resp = current_app.response_class(status=304)
+    else:
+        resp = make_response(build())
+    resp.set_etag(etag, weak=True)
+    resp.cache_control.private = True
+    resp.cache_control.no_cache = True
+    return resp
+
+
+def page_state(page, *extra):
+    """列表頁用到的資料：這一頁每筆的列表欄位（含瀏覽數）與前後頁游標"""
+    return [page.rows, page.next_cursor, page.prev_cursor, page.has_next, page.has_prev, *extra]
+
+
+def conditional_json(obj):
+    """小型 JSON 回應（草稿、偏好設定）：ETag 直接由回應內容算"""
+    return conditional(obj, lambda: jsonify(obj))
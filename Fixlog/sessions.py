@@ -0,0 +1,291 @@
+# sessions.py
+# 伺服器端 session（選配）：cookie 裡只放一個隨機 id，session 內容存在本機檔案或 SQLite，
+# 同一台主機上的多個 worker 共用。
+#   FIXLOG_SESSION        —— cookie（預設，維持 Flask 的簽章 cookie）/ file / sqlite
+#   FIXLOG_SESSION_PATH   —— file：資料夾（預設 data/sessions）；sqlite：資料庫檔（預設 data/sessions.db）
+#   FIXLOG_SESSION_IDLE   —— 閒置多久失效（小時，預設 168）
+#   FIXLOG_SESSION_CACHE  —— 每個 worker 在記憶體裡快取幾個常用的 session（預設 1024）
+#   FIXLOG_SESSION_SWEEP  —— 背景清掉過期 session 的間隔（秒，預設 600，0 關閉）
+#
+# 每個請求只檢查一次 session 的變更戳記（檔案 stat / SQLite 一列），沒變就用記憶體裡的內容，不必讀檔；
+# 別的 worker 改過（例如登出）戳記就不同，會重新讀。最後存取時間最多每 TOUCH_EVERY 秒寫一次。
+import os, re, time, sqlite3, secrets, threading, atexit
+from collections import OrderedDict
+
+from flask.sessions import SessionInterface, SecureCookieSession, session_json_serializer
+
+from storage.writer import atomic_write
+
+TOUCH_EVERY = 60
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+_SID_RE = re.compile(r'^[\w-]{43}$')  # secrets.token_urlsafe(32)；也擋掉 ../ 之類的檔名
+
+
+class FileSessions:
+    """一個 session 一個檔案：內容改了 mtime 就變（當作戳記），最後存取時間記在 atime"""
+
+    def __init__(self, path):
+        self.dir = path
+        os.makedirs(path, exist_ok=True)
+
+    def _path(self, sid):
+        return os.path.join(self.dir, sid + '.json')
+
+    def stat(self, sid):
+        """(戳記, 最後存取時間)；不存在回 None"""
+        try:
+            st = os.stat(self._path(sid))
+        except OSError:
+            return None
+        return st.st_mtime_ns, max(st.st_atime, st.st_mtime)
+
+    def read(self, sid):
+        """(戳記, 內容)；不存在回 None"""
+        try:
+            with open(self._path(sid), 'rb') as f:
+                st = os.fstat(f.fileno())
+                return st.st_mtime_ns, f.read().decode('utf-8')
+        except OSError:
+            return None
+
+    def write(self, sid, raw):
+        return atomic_write(self._path(sid), raw.encode('utf-8')).st_mtime_ns
+
+    def touch(self, sid, now):
+        path = self._path(sid)
+        try:
+            os.utime(path, ns=(int(now * 1e9), os.stat(path).st_mtime_ns))  # 只改 atime，戳記不變
+        except OSError:
+            pass
+
+    def delete(self, sid):
+        try:
+            os.remove(self._path(sid))
+        except OSError:
+            pass
+
+    def sweep(self, older_than):
+        removed = 0
+        for name in os.listdir(self.dir):
+            if not name.endswith('.json'):
+                continue
+            st = self.stat(name[:-5])
+            if st is not None and st[1] < older_than:
+                self.delete(name[:-5])
+                removed += 1
+        return removed
+
+
+class SqliteSessions:
+    """sessions(sid, v, accessed, data)：v 是內容的戳記，每次寫入換一個"""
+
+    _SCHEMA = """
+    CREATE TABLE IF NOT EXISTS sessions (
+        sid      TEXT PRIMARY KEY,
+        v        INTEGER NOT NULL,
+        accessed REAL NOT NULL,
+        data     TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS sessions_accessed ON sessions (accessed);
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        with self._db() as db:
+            db.executescript(self._SCHEMA)
+
+    def _db(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db = db
+        return db
+
+    def stat(self, sid):
+        return self._db().execute('SELECT v, accessed FROM sessions WHERE sid = ?', (sid,)).fetchone()
+
+    def read(self, sid):
+        return self._db().execute('SELECT v, data FROM sessions WHERE sid = ?', (sid,)).fetchone()
+
+    def write(self, sid, raw):
+        v = time.time_ns()
+        with self._db() as db:
+            db.execute('INSERT OR REPLACE INTO sessions (sid, v, accessed, data) VALUES (?, ?, ?, ?)',
+                       (sid, v, time.time(), raw))
+        return v
+
+    def touch(self, sid, now):
+        with self._db() as db:
+            db.execute('UPDATE sessions SET accessed = ? WHERE sid = ?', (now, sid))
+
+    def delete(self, sid):
+        with self._db() as db:
+            db.execute('DELETE FROM sessions WHERE sid = ?', (sid,))
+
+    def sweep(self, older_than):
+        with self._db() as db:
+            return db.execute('DELETE FROM sessions WHERE accessed < ?', (older_than,)).rowcount
+
+
+class SessionStore:
+    """後端 + 記憶體 LRU（{ sid: (戳記, 內容) }）+ 閒置失效 + 背景清理"""
+
+    def __init__(self, backend, idle=168 * 3600, cache_size=1024, sweep_interval=600):
+        self.backend = backend
+        self.idle = idle
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._wake = threading.Event()
+        self._stop = False
+        self._thread = None
+        if sweep_interval:
+            self.sweep_interval = sweep_interval
+            self._thread = threading.Thread(target=self._run, name='session-sweeper', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _remember(self, sid, stamp, raw):
+        with self._lock:
+            self._cache[sid] = (stamp, raw)
+            self._cache.move_to_end(sid)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _forget(self, sid):
+        with self._lock:
+            self._cache.pop(sid, None)
+
+    def load(self, sid):
+        """session 內容（dict）；不存在或已閒置過久回 None"""
+        now = time.time()
+        st = self.backend.stat(sid)
+        if st is None:
+            self._forget(sid)
+            return None
+        stamp, accessed = st
+        if now - accessed > self.idle:
+            self.delete(sid)
+            return None
+        with self._lock:
+            cached = self._cache.get(sid)
+            if cached is not None and cached[0] == stamp:
+                self._cache.move_to_end(sid)
+                self.hits += 1
+                raw = cached[1]
+            else:
+                raw = None
+                self.misses += 1
+        if raw is None:
+            row = self.backend.read(sid)
+            if row is None:
+                return None
+            stamp, raw = row
+            self._remember(sid, stamp, raw)
+        if now - accessed > TOUCH_EVERY:
+            self.backend.touch(sid, now)
+        return session_json_serializer.loads(raw)
+
+    def save(self, sid, data):
+        raw = session_json_serializer.dumps(data)
+        with self._lock:
+            cached = self._cache.get(sid)
+        if cached is not None and cached[1] == raw:
+            return  # 內容沒變，不必寫
+        self._remember(sid, self.backend.write(sid, raw), raw)
+
+    def delete(self, sid):
+        self._forget(sid)
+        self.backend.delete(sid)
+
+    def sweep(self):
+        return self.backend.sweep(time.time() - self.idle)
+
+    def _run(self):
+        while not self._stop:
+            self._wake.wait(self.sweep_interval)
+            if self._stop:
+                break
+            try:
+                self.sweep()
+            except Exception:
+                pass  # 清理失敗不影響服務，下一輪再試
+
+    def close(self):
+        if self._stop:
+            return
+        self._stop = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+
+class ServerSession(SecureCookieSession):
+    def __init__(self, initial=None, sid=None):
+        super().__init__(initial)
+        self.sid = sid
+        self.login = (initial or {}).get('username')
+
+
+class ServerSessionInterface(SessionInterface):
+    def __init__(self, store):
+        self.store = store
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        data = self.store.load(sid) if sid and _SID_RE.match(sid) else None
+        if data is None:
+            return ServerSession()
+        return ServerSession(data, sid=sid)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if not session:
+            if session.sid is not None:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+        if not session.modified:
+            return
+        sid = session.sid
+        if sid is not None and session.get('username') != session.login:
+            # 登入身分換了（登入 / 切換帳號）就換一個 id，舊的 id 作廢
+            self.store.delete(sid)
+            sid = None
+        is_new = sid is None
+        if is_new:
+            sid = secrets.token_urlsafe(32)
+        self.store.save(sid, dict(session))
+        if is_new or self.should_set_cookie(app, session):
+            response.set_cookie(name, sid, expires=self.get_expiration_time(app, session),
+                                httponly=self.get_cookie_httponly(app), domain=domain, path=path,
+                                secure=self.get_cookie_secure(app), samesite=self.get_cookie_samesite(app))
+        response.vary.add('Cookie')
+
+
+def init_app(app):
+    kind = (os.environ.get('FIXLOG_SESSION') or 'cookie').strip().lower()
+    if kind == 'cookie':
+        return None
+    if kind == 'file':
+        backend = FileSessions(os.environ.get('FIXLOG_SESSION_PATH') or os.path.join(DATA_DIR, 'sessions'))
+    elif kind == 'sqlite':
+        backend = SqliteSessions(os.environ.get('FIXLOG_SESSION_PATH') or os.path.join(DATA_DIR, 'sessions.db'))
+    else:
+        raise ValueError(f'unknown session backend: {kind}')
+    store = SessionStore(backend,
+                         idle=float(os.environ.get('FIXLOG_SESSION_IDLE', 168)) * 3600,
+                         cache_size=int(os.environ.get('FIXLOG_SESSION_CACHE', 1024)),
+                         sweep_interval=float(os.environ.get('FIXLOG_SESSION_SWEEP', 600)))
+    app.session_interface = ServerSessionInterface(store)
+    return store
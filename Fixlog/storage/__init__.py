@@ -0,0 +1,31 @@
+# storage/__init__.py
+# 資料存取層：以環境變數 FIXLOG_STORAGE 選擇後端（json 預設 / sqlite）
+import os
+
+from .base import Store
+from .json_backend import JsonStore
+from .sqlite_backend import SqliteStore
+
+BACKENDS = {
+    'json': JsonStore,
+    'sqlite': SqliteStore,
+}
+
+_store = None
+
+
+def open_store(kind=None, **kwargs):
+    kind = (kind or os.environ.get('FIXLOG_STORAGE') or 'json').strip().lower()
+    if kind not in BACKENDS:
+        raise ValueError(f'unknown storage backend: {kind}')
+    if kind == 'sqlite' and 'path' not in kwargs and os.environ.get('FIXLOG_DB'):
+        kwargs['path'] = os.environ['FIXLOG_DB']
+    return BACKENDS[kind](**kwargs)
+
+
+def get_store():
+    """整個程式共用同一個 store"""
+    global _store
+    if _store is None:
+        _store = open_store()
+    return _store
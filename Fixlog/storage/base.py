@@ -0,0 +1,278 @@
+# storage/base.py
+# 各類資料的 Repository 介面；實作見 json_backend.py / sqlite_backend.py
+import time, hashlib
+from datetime import datetime
+from uuid import uuid4
+
+# 紀錄裡唯一會很大的欄位（內文 HTML）；列表只需要其餘欄位，內文另外存、用到才讀
+BODY_FIELD = 'details'
+
+
+def split_body(record):
+    """(不含內文的列表欄位, 內文)；沒有內文欄位時內文為 None"""
+    meta = {k: v for k, v in record.items() if k != BODY_FIELD}
+    return meta, record.get(BODY_FIELD)
+
+
+class RecordRepo:
+    """維修紀錄 / 工具紀錄：以 id 為主鍵，all() 依新到舊排列
+
+    all() 只回列表欄位（不含內文），內文用 body() 另外讀；get() 回完整紀錄。
+    update() 的紀錄沒有內文欄位時保留原本的內文。
+    """
+
+    def all(self):
+        raise NotImplementedError
+
+    def get(self, record_id):
+        raise NotImplementedError
+
+    def body(self, record_id):
+        """單筆紀錄的內文；沒有回 None"""
+        raise NotImplementedError
+
+    def insert(self, record):
+        """新增一筆（排在最前面）"""
+        raise NotImplementedError
+
+    def update(self, record):
+        """以 record['id'] 覆寫整筆"""
+        raise NotImplementedError
+
+    def update_many(self, records):
+        for r in records:
+            self.update(r)
+
+    def delete(self, record_id):
+        """刪除一筆；回傳是否有刪到"""
+        raise NotImplementedError
+
+    def set_views(self, record_id, views):
+        raise NotImplementedError
+
+    def add_views(self, deltas):
+        """批次累加瀏覽數：{ id: 增量 }，一次寫入"""
+        raise NotImplementedError
+
+    def version(self):
+        """便宜的變更戳記：資料被任何人改過就會不同"""
+        raise NotImplementedError
+
+    def views_version(self):
+        """只有瀏覽數變動時的戳記；後端分不出來時與 version() 相同"""
+        return self.version()
+
+    def write(self, fn):
+        """在寫入鎖裡執行 fn()，回傳 (結果, 寫之前的戳記, 寫之後的戳記)，戳記為 (version, views_version)；
+        後端要保證前後兩次讀戳記之間只有 fn() 寫入，快取才分得出「只有自己改過」"""
+        before = (self.version(), self.views_version())
+        result = fn()
+        return result, before, (self.version(), self.views_version())
+
+    def views_map(self):
+        """{ id: 瀏覽數 }"""
+        return {r['id']: r.get('views', 0) for r in self.all()}
+
+
+class UserRepo:
+    """使用者：以 username 為主鍵"""
+
+    def all(self):
+        raise NotImplementedError
+
+    def get(self, username):
+        raise NotImplementedError
+
+    def upsert(self, user):
+        raise NotImplementedError
+
+    def delete(self, username):
+        raise NotImplementedError
+
+    def replace_all(self, users):
+        raise NotImplementedError
+
+    def version(self):
+        raise NotImplementedError
+
+    def write(self, fn):
+        """同 RecordRepo.write()，戳記只有 version()"""
+        before = self.version()
+        result = fn()
+        return result, before, self.version()
+
+
+# 草稿的內容欄位；自動存檔只送有改的欄位
+DRAFT_FIELDS = ('title', 'category', 'details')
+
+
+def draft_hash(draft):
+    """草稿內容（標題、分類、內文）的雜湊：內容沒變的自動存檔就不必再寫"""
+    h = hashlib.sha1()
+    for k in DRAFT_FIELDS:
+        h.update(str(draft.get(k) or '').encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+def _epoch(ts):
+    """時間戳記 → epoch 秒：數字（毫秒自動換算）、數字字串、ISO 字串；無法判斷回 None"""
+    if isinstance(ts, str):
+        ts = ts.strip()
+        try:
+            ts = float(ts)
+        except ValueError:
+            try:
+                return datetime.fromisoformat(ts).timestamp() if ts else None
+            except ValueError:
+                return None
+    if isinstance(ts, bool) or not isinstance(ts, (int, float)):
+        return None
+    return ts / 1000 if ts > 1e12 else float(ts)
+
+
+def draft_time(draft):
+    """草稿的 updated_at（epoch 秒）；沒有時回 None"""
+    return _epoch(draft.get('updated_at'))
+
+
+# 草稿的標準格式（第 DRAFT_SCHEMA 版）：
+#   {id, owner, title, category, details, updated_at（epoch 秒，整數）, hash}
+# 舊資料的各種別名只在搬移（storage 開啟時做一次）時處理，之後一律直接讀這幾個欄位
+DRAFT_SCHEMA = 1
+_ID_KEYS = ('id', '_id', 'draft_id', 'guid')
+_OWNER_KEYS = ('owner', 'username', 'user', 'author')
+_TIME_KEYS = ('updated_at', 'updatedAt', 'time', 'timestamp', 'modified', 'mtime')
+
+
+def _first(d, keys):
+    return next((d[k] for k in keys if d.get(k)), None)
+
+
+def canonical_draft(d, owner=None, now=None):
+    """任何舊形態的草稿 → 標準格式；owner 是找不到擁有者欄位時的預設值"""
+    ts = _epoch(_first(d, _TIME_KEYS))
+    draft = {
+        'id': str(_first(d, _ID_KEYS) or uuid4()),
+        'owner': _first(d, _OWNER_KEYS) or owner,
+        'title': d.get('title') or d.get('subject') or '',
+        'category': d.get('category') or '',
+        'details': d.get('details') or '',
+        # 沒有時間的舊草稿以搬移當下為準
+        'updated_at': int(ts if ts is not None else (now or time.time())),
+    }
+    draft['hash'] = draft_hash(draft)
+    return draft
+
+
+def newest_first(items):
+    """依 updated_at 新到舊排序（時間不明的排最後）；穩定排序，同時間維持原順序"""
+    items.sort(key=lambda d: draft_time(d) or 0, reverse=True)
+    return items
+
+
+def expired_drafts(items, max_per_user=None, older_than=None):
+    """同一位使用者的草稿裡該淘汰的：超過 max_per_user 筆的舊草稿，以及 updated_at 早於 older_than 的"""
+    items = newest_first(list(items))
+    drop = []
+    for i, d in enumerate(items):
+        ts = draft_time(d)
+        if (max_per_user and i >= max_per_user) or (older_than is not None and ts is not None and ts < older_than):
+            drop.append(d)
+    return drop
+
+
+class DraftRepo:
+    """草稿：all() 回傳攤平後的清單，每筆都是標準格式（見 canonical_draft）
+
+    for_owner / latest 只看單一使用者的草稿，後端應以使用者為單位存放，不必讀全部。
+    """
+
+    def all(self):
+        raise NotImplementedError
+
+    def for_owner(self, owner):
+        """某位使用者的草稿，新到舊"""
+        return newest_first([d for d in self.all() if d.get('owner') == owner])
+
+    def latest(self, owner=None):
+        """某位使用者最新的一筆；owner 為 None 時為所有人裡最新的一筆"""
+        items = self.for_owner(owner) if owner is not None else newest_first(self.all())
+        return items[0] if items else None
+
+    def get(self, draft_id, owner=None):
+        """owner 只是提示：先找那位使用者的草稿，找不到再找全部"""
+        if owner is not None:
+            d = next((d for d in self.for_owner(owner) if str(d.get('id')) == str(draft_id)), None)
+            if d is not None:
+                return d
+        return next((d for d in self.all() if str(d.get('id')) == str(draft_id)), None)
+
+    def insert(self, draft):
+        """寫入一筆草稿；同 id 的舊草稿會被取代"""
+        raise NotImplementedError
+
+    def save(self, owner, fields, draft_id=None):
+        """自動存檔（upsert）：draft_id 是 owner 的草稿就只改 fields 裡有的欄位，否則新增一筆。
+        沒帶 draft_id 時拿 owner 最新的一筆比對。內容雜湊和上次一樣就不寫。
+        回傳 (草稿, 是否有寫入)
+        """
+        found = self.get(draft_id, owner=owner) if draft_id else self.latest(owner)
+        # 別人的草稿不能改：以它的內容為底另存一筆（編輯器回填的可能是全局最新的草稿）
+        cur = found if found is not None and found.get('owner') == owner else None
+        draft = dict(cur) if cur is not None else {k: (found or {}).get(k) or '' for k in DRAFT_FIELDS}
+        draft.update((k, fields[k]) for k in DRAFT_FIELDS if k in fields)
+        digest = draft_hash(draft)
+        if cur is not None and (cur.get('hash') or draft_hash(cur)) == digest:
+            return cur, False
+        if cur is None or not draft_id:
+            # 舊前端不帶 id：內容有變就照舊另存新的一筆
+            draft['id'] = str(uuid4())
+            draft['owner'] = owner
+        draft['hash'] = digest
+        draft['updated_at'] = int(time.time())
+        self.insert(draft)
+        return draft, True
+
+    def prune(self, max_per_user=None, older_than=None):
+        """保留政策：每位使用者只留最新 max_per_user 筆，並刪掉 updated_at 早於 older_than（epoch 秒）的；
+        回傳刪除筆數。後端可覆寫成只讀必要的資料"""
+        by_owner = {}
+        for d in self.all():
+            by_owner.setdefault(d.get('owner'), []).append(d)
+        removed = 0
+        for owner, items in by_owner.items():
+            for d in expired_drafts(items, max_per_user, older_than):
+                if self.delete(d.get('id'), owner=owner):
+                    removed += 1
+        return removed
+
+    def delete(self, draft_id, owner=None):
+        """owner 為 None 表示不限擁有者（技師）；回傳是否有刪到"""
+        raise NotImplementedError
+
+
+class PrefRepo:
+    """使用者偏好：{ username: {...} }"""
+
+    def get(self, username):
+        raise NotImplementedError
+
+    def set(self, username, prefs):
+        raise NotImplementedError
+
+    def all(self):
+        raise NotImplementedError
+
+
+class Store:
+    """一個後端 = 五個 repository"""
+    kind = None
+    repairs = None
+    tools = None
+    users = None
+    drafts = None
+    prefs = None
+
+    def close(self):
+        pass
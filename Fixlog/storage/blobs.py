@@ -0,0 +1,275 @@
+# storage/blobs.py
+# 把內文裡的 data:image/...;base64 圖片抽出成 static/uploads/ 底下的檔案，
+# 內文只留下檔案網址，紀錄本身就不會動輒好幾 MB
+#
+#   發布時：new_repair 先呼叫 extract_images() 再存檔
+#   既有資料（紀錄與草稿）：python -m storage.blobs（請先停止網站，遷移完再啟動）
+#
+# 檔名以內容的 sha256 命名，同一張截圖貼十次也只存一份；
+# 另外在背景產生縮圖（static/uploads/thumbs/），需要 Pillow，沒裝就一律用原圖
+import os, re, sys, base64, binascii, hashlib, threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .base import draft_hash
+from .json_backend import BASE_DIR
+from .writer import temp_file
+
+try:
+    from PIL import Image
+except ImportError:  # 縮圖是選配功能
+    Image = None
+
+UPLOAD_DIR = os.path.join(BASE_DIR, 'static', 'uploads')
+UPLOAD_URL = '/static/uploads/'
+THUMB_DIR = os.path.join(UPLOAD_DIR, 'thumbs')
+# 縮圖規格：列表用小圖、內文預覽用中圖（最大寬度，像素）
+THUMB_SIZES = {'small': 320, 'preview': 1024}
+
+_CHUNK = 64 * 1024
+_thumb_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='thumbs')
+_thumb_lock = threading.Lock()
+_thumb_jobs = 0   # 已排入、還沒做完的縮圖工作數
+
+_DATA_URI_RE = re.compile(
+    r'''(?P<q>["'])data:(?P<mime>image/[\w.+-]+);base64,(?P<b64>[A-Za-z0-9+/=\s]+)(?P=q)''')
+
+_EXTS = {
+    'image/png': '.png',
+    'image/jpeg': '.jpg',
+    'image/jpg': '.jpg',
+    'image/gif': '.gif',
+    'image/webp': '.webp',
+    'image/bmp': '.bmp',
+}
+
+
+def save_stream(stream, ext, upload_dir=UPLOAD_DIR):
+    """邊寫暫存檔邊算 sha256，再改名成內容雜湊；內容重複就丟掉暫存檔。回傳檔名"""
+    os.makedirs(upload_dir, exist_ok=True)
+    h = hashlib.sha256()
+    fd, tmp = temp_file(upload_dir, suffix='.part')  # 權限照 umask，網頁伺服器才讀得到
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            while True:
+                chunk = stream.read(_CHUNK)
+                if not chunk:
+                    break
+                h.update(chunk)
+                f.write(chunk)
+        name = f'{h.hexdigest()}{ext}'
+        path = os.path.join(upload_dir, name)
+        if os.path.exists(path):
+            os.remove(tmp)
+        else:
+            os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    schedule_thumbnails(name, upload_dir)
+    return name
+
+
+def save_blob(data, ext, upload_dir=UPLOAD_DIR):
+    """寫入一個上傳檔（bytes），回傳檔名"""
+    name = f'{hashlib.sha256(data).hexdigest()}{ext}'
+    path = os.path.join(upload_dir, name)
+    if not os.path.exists(path):
+        os.makedirs(upload_dir, exist_ok=True)
+        fd, tmp = temp_file(upload_dir, suffix='.part')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    schedule_thumbnails(name, upload_dir)
+    return name
+
+
+def _thumb_name(name, size):
+    stem, ext = os.path.splitext(name)
+    return f'{stem}_{THUMB_SIZES[size]}{ext}'
+
+
+def make_thumbnails(name, upload_dir=UPLOAD_DIR):
+    """產生各尺寸縮圖；原圖已經夠小的就不產生（直接用原圖）"""
+    if Image is None:
+        return
+    src = os.path.join(upload_dir, name)
+    thumb_dir = os.path.join(upload_dir, 'thumbs')
+    os.makedirs(thumb_dir, exist_ok=True)
+    try:
+        with Image.open(src) as im:
+            for size, width in THUMB_SIZES.items():
+                dst = os.path.join(thumb_dir, _thumb_name(name, size))
+                if os.path.exists(dst) or im.width <= width:
+                    continue
+                t = im.copy()
+                t.thumbnail((width, width * 10))
+                tmp = dst + '.part'
+                t.save(tmp, format=im.format)
+                os.replace(tmp, dst)
+    except Exception:
+        pass  # 不是圖片或格式不支援：保留原圖即可
+
+
+def _thumb_job(name, upload_dir):
+    global _thumb_jobs
+    try:
+        make_thumbnails(name, upload_dir)
+    finally:
+        with _thumb_lock:
+            _thumb_jobs -= 1
+
+
+def schedule_thumbnails(name, upload_dir=UPLOAD_DIR):
+    global _thumb_jobs
+    if Image is not None:
+        with _thumb_lock:
+            _thumb_jobs += 1
+        _thumb_pool.submit(_thumb_job, name, upload_dir)
+
+
+def thumbs_pending():
+    """還有縮圖在產生中：此時 thumb_url 可能暫時回原圖，render 結果不該被快取"""
+    return _thumb_jobs > 0
+
+
+def thumb_url(url, size='small'):
+    """上傳檔網址 → 縮圖網址；縮圖還沒好或不存在就回原圖"""
+    if not url or not url.startswith(UPLOAD_URL) or Image is None:
+        return url
+    name = url[len(UPLOAD_URL):]
+    thumb = _thumb_name(name, size)
+    if os.path.exists(os.path.join(THUMB_DIR, thumb)):
+        return f'{UPLOAD_URL}thumbs/{thumb}'
+    return url
+
+
+_UPLOAD_IMG_RE = re.compile(r'<img\b([^>]*?)\bsrc=(["\'])(' + re.escape(UPLOAD_URL) + r'[^"\']+)\2([^>]*)>')
+
+
+def first_upload(html):
+    """內文裡第一張上傳圖片的網址（列表卡片的封面）"""
+    m = _UPLOAD_IMG_RE.search(html or '')
+    return m.group(3) if m else None
+
+
+def preview_images(html):
+    """內文的上傳圖片改用預覽尺寸，點圖開原圖"""
+    if not html or UPLOAD_URL not in html:
+        return html
+
+    def repl(m):
+        url = m.group(3)
+        small = thumb_url(url, 'preview')
+        if small == url:
+            return m.group(0)
+        q = m.group(2)
+        return f'<a href={q}{url}{q} target="_blank"><img{m.group(1)}src={q}{small}{q}{m.group(4)}></a>'
+
+    return _UPLOAD_IMG_RE.sub(repl, html)
+
+
+def extract_images(html, upload_dir=UPLOAD_DIR, url_prefix=UPLOAD_URL):
+    """回傳 (新的 HTML, 抽出的張數)；無法解碼或不認得的格式原樣保留"""
+    if not html or 'data:image/' not in html:
+        return html, 0
+    count = 0
+
+    def repl(m):
+        nonlocal count
+        ext = _EXTS.get(m.group('mime').lower())
+        if not ext:
+            return m.group(0)
+        try:
+            data = base64.b64decode(re.sub(r'\s+', '', m.group('b64')), validate=True)
+        except (binascii.Error, ValueError):
+            return m.group(0)
+        name = save_blob(data, ext, upload_dir)
+        count += 1
+        q = m.group('q')
+        return f'{q}{url_prefix}{name}{q}'
+
+    return _DATA_URI_RE.sub(repl, html), count
+
+
+_HASH_NAME_RE = re.compile(r'^[0-9a-f]{64}\.\w+$')
+
+
+def rehash_uploads(upload_dir=UPLOAD_DIR):
+    """把舊的 uuid 檔名改成內容雜湊，重複的檔案合併；回傳 { 舊檔名: 新檔名 }"""
+    renames = {}
+    if not os.path.isdir(upload_dir):
+        return renames
+    for name in sorted(os.listdir(upload_dir)):
+        path = os.path.join(upload_dir, name)
+        if not os.path.isfile(path) or _HASH_NAME_RE.match(name) or name.endswith('.part'):
+            continue
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(_CHUNK), b''):
+                h.update(chunk)
+        new = f'{h.hexdigest()}{os.path.splitext(name)[1].lower()}'
+        if os.path.exists(os.path.join(upload_dir, new)):
+            os.remove(path)
+        else:
+            os.replace(path, os.path.join(upload_dir, new))
+        renames[name] = new
+    return renames
+
+
+def migrate(store, upload_dir=UPLOAD_DIR):
+    """抽出既有紀錄與草稿的內嵌圖片、上傳檔改用內容雜湊命名並補上縮圖；
+    回傳 { kind: (改寫筆數, 圖片張數) }，kind 為 repairs / tools / drafts"""
+    renames = rehash_uploads(upload_dir)
+    name_re = None
+    if renames:
+        name_re = re.compile(re.escape(UPLOAD_URL) + '(' + '|'.join(map(re.escape, renames)) + ')')
+
+    def rewrite(body):
+        html, n = extract_images(body, upload_dir)
+        if name_re is not None and html:
+            html = name_re.sub(lambda m: UPLOAD_URL + renames[m.group(1)], html)
+        return html, n
+
+    result = {}
+    for kind in ('repairs', 'tools'):
+        repo = getattr(store, kind)
+        changed, images = [], 0
+        for r in repo.all():
+            body = repo.body(r['id'])
+            html, n = rewrite(body)
+            cover = first_upload(html)
+            if html != body or cover != r.get('cover'):
+                changed.append(dict(r, details=html, cover=cover))
+                images += n
+        repo.update_many(changed)
+        result[kind] = (len(changed), images)
+    # 草稿（new.html 自動存檔，所有使用者）裡的圖片網址也要跟著改，否則檔案改名後草稿的圖就壞了
+    changed, images = 0, 0
+    for d in store.drafts.all():
+        body = d.get('details')
+        html, n = rewrite(body)
+        if html != body:
+            d = dict(d, details=html)
+            d['hash'] = draft_hash(d)
+            store.drafts.insert(d)  # 同 id 取代，updated_at 不變
+            changed += 1
+            images += n
+    result['drafts'] = (changed, images)
+    if os.path.isdir(upload_dir):
+        for name in os.listdir(upload_dir):
+            if _HASH_NAME_RE.match(name):
+                schedule_thumbnails(name, upload_dir)
+    return result
+
+
+def main(argv=None):
+    from . import get_store
+    for kind, (changed, images) in migrate(get_store()).items():
+        print(f'{kind}: {changed} 筆紀錄，抽出 {images} 張圖片')
+    _thumb_pool.shutdown(wait=True)  # 等縮圖做完再結束
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,172 @@
+# storage/codec.py
+# JSON 編解碼：有 orjson / msgspec 就用，沒有就退回標準庫 json
+#   FIXLOG_JSON_CODEC   —— auto（預設，orjson → msgspec → stdlib）/ orjson / msgspec / stdlib
+#   FIXLOG_JSON_COMPACT —— 1 時資料檔不縮排（檔案小、寫得快）；預設維持縮排 2，方便人工查看
+#
+# 量測：python -m storage.codec [repairs.json] [--records N]
+import os, sys, json, time, argparse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+class _Stdlib:
+    name = 'stdlib'
+
+    @staticmethod
+    def dumps(obj, pretty=False, default=None):
+        if pretty:
+            text = json.dumps(obj, ensure_ascii=False, indent=2, default=default)
+        else:
+            text = json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=default)
+        return text.encode('utf-8')
+
+    @staticmethod
+    def loads(data):
+        return json.loads(data)
+
+
+class _Orjson:
+    name = 'orjson'
+
+    @staticmethod
+    def dumps(obj, pretty=False, default=None):
+        # orjson 只接受 str 鍵，其他型別退回標準庫
+        opts = orjson.OPT_INDENT_2 if pretty else 0
+        try:
+            return orjson.dumps(obj, default=default, option=opts | orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            return _Stdlib.dumps(obj, pretty, default)
+
+    @staticmethod
+    def loads(data):
+        return orjson.loads(data)
+
+
+class _Msgspec:
+    name = 'msgspec'
+
+    _encoder = None
+    _decoder = None
+
+    @classmethod
+    def dumps(cls, obj, pretty=False, default=None):
+        if default is not None:
+            data = msgspec.json.Encoder(enc_hook=default).encode(obj)
+        else:
+            if cls._encoder is None:
+                cls._encoder = msgspec.json.Encoder()
+            data = cls._encoder.encode(obj)
+        return msgspec.json.format(data, indent=2) if pretty else data
+
+    @classmethod
+    def loads(cls, data):
+        if cls._decoder is None:
+            cls._decoder = msgspec.json.Decoder()
+        try:
+            return cls._decoder.decode(data)
+        except msgspec.DecodeError as e:
+            # 和 json / orjson 一樣丟 ValueError，呼叫端（例如 Flask 的 get_json）才接得到
+            raise ValueError(str(e)) from e
+
+
+CODECS = {'stdlib': _Stdlib}
+if orjson is not None:
+    CODECS['orjson'] = _Orjson
+if msgspec is not None:
+    CODECS['msgspec'] = _Msgspec
+
+
+def pick(name=None):
+    name = (name or os.environ.get('FIXLOG_JSON_CODEC') or 'auto').strip().lower()
+    if name == 'auto':
+        for name in ('orjson', 'msgspec', 'stdlib'):
+            if name in CODECS:
+                return CODECS[name]
+    if name not in CODECS:
+        raise ValueError(f'JSON codec not available: {name}')
+    return CODECS[name]
+
+
+codec = pick()
+COMPACT = os.environ.get('FIXLOG_JSON_COMPACT', '0').strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def dumps(obj, pretty=False, default=None):
+    """物件 → UTF-8 bytes（不跳脫中文）"""
+    return codec.dumps(obj, pretty, default)
+
+
+def dump_file(obj):
+    """資料檔的內容：依 FIXLOG_JSON_COMPACT 決定要不要縮排"""
+    return codec.dumps(obj, not COMPACT)
+
+
+def loads(data):
+    """bytes / str → 物件；格式錯誤一律丟 ValueError"""
+    return codec.loads(data)
+
+
+def _sample(n):
+    body = '<p>' + '印表機卡紙，更換滾輪後恢復正常。Printer jam fixed. ' * 40 + '</p>'
+    return [{
+        'id': f'{i:08x}-0000-4000-8000-000000000000',
+        'title': f'維修紀錄 {i}',
+        'category': 'ERP',
+        'date': '2024-01-01',
+        'author': 'admin',
+        'status': '已完成',
+        'summary': '摘要' * 20,
+        'details': body,
+        'views': i % 97,
+    } for i in range(n)]
+
+
+def _bench(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='比較各 JSON 編解碼器的讀寫速度')
+    ap.add_argument('path', nargs='?', help='要量測的 JSON 檔（例如 data/repairs.json）；不給就產生測試資料')
+    ap.add_argument('--records', type=int, default=5000, help='測試資料筆數')
+    ap.add_argument('--repeat', type=int, default=5)
+    args = ap.parse_args(argv)
+
+    if args.path:
+        with open(args.path, 'rb') as f:
+            data = json.loads(f.read())
+        label = args.path
+    else:
+        data = _sample(args.records)
+        label = f'{args.records} 筆測試資料'
+    print(f'{label}（最佳 {args.repeat} 次，毫秒）')
+    print(f'{"codec":<8} {"mode":<8} {"dumps":>9} {"loads":>9} {"size":>12}')
+    baseline = None
+    for name, c in CODECS.items():
+        for pretty in (True, False):
+            raw = c.dumps(data, pretty)
+            t_dump = _bench(lambda: c.dumps(data, pretty), args.repeat)
+            t_load = _bench(lambda: c.loads(raw), args.repeat)
+            if baseline is None:
+                baseline = t_dump + t_load
+            mode = 'indent' if pretty else 'compact'
+            speedup = baseline / (t_dump + t_load)
+            print(f'{name:<8} {mode:<8} {t_dump * 1000:>9.1f} {t_load * 1000:>9.1f} {len(raw):>12,}  x{speedup:.1f}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
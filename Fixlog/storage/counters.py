@@ -0,0 +1,134 @@
+# storage/counters.py
+# 瀏覽數的持久化模式（FIXLOG_VIEW_MODE）：
+#   log    —— 預設；每次瀏覽 append 一行到 data/views.log（見 viewlog.py）
+#   buffer —— 只在記憶體累加，每 flush_interval 秒或滿 flush_every 筆時整批寫回，
+#             正常關閉時也會寫回。當機最多遺失「一個 flush 視窗」的瀏覽數：
+#             不超過 flush_interval 秒、且不超過 flush_every 筆。
+#   sync   —— 每次瀏覽立即寫回 store
+import os, time, threading, atexit
+
+from .viewlog import ViewLog
+
+
+class SyncViews:
+    """每次瀏覽直接寫回 store；介面與 ViewLog 相同"""
+
+    writes_store = True  # record() 當場改到 store
+
+    def __init__(self, store):
+        self.store = store
+
+    def record(self, kind, record_id, n=1):
+        getattr(self.store, kind).add_views({record_id: n})
+
+    def views(self, kind, read):
+        return read()
+
+    def fold(self, kind, records):
+        return records
+
+    def compact(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class ViewBuffer:
+    """記憶體計數緩衝，由背景執行緒定期整批寫回"""
+
+    writes_store = False
+
+    def __init__(self, store, flush_interval=10, flush_every=500):
+        self.store = store
+        self.flush_interval = flush_interval
+        self.flush_every = flush_every
+        self._lock = threading.Lock()
+        self._pending = {}          # { (kind, id): 尚未寫回的增量 }
+        self._count = 0
+        self._wake = threading.Event()
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name='view-buffer-flush', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def record(self, kind, record_id, n=1):
+        with self._lock:
+            key = (kind, record_id)
+            self._pending[key] = self._pending.get(key, 0) + n
+            self._count += n
+            if self._count >= self.flush_every:
+                self._wake.set()
+
+    def views(self, kind, read):
+        """read() 讀 store 的 { id: 瀏覽數 }，加上還沒寫回的增量"""
+        views = read()
+        with self._lock:
+            for (k, rid), n in self._pending.items():
+                if k == kind and rid in views:
+                    views[rid] = (views[rid] or 0) + n
+        return views
+
+    def fold(self, kind, records):
+        if self._pending:
+            for r in records:
+                n = self._pending.get((kind, r.get('id')))
+                if n:
+                    r['views'] = r.get('views', 0) + n
+        return records
+
+    def flush(self):
+        """把目前累積的增量交換出來，每個 kind 一次寫入"""
+        with self._lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, {}
+            self._count = 0
+        by_kind = {}
+        for (kind, rid), n in batch.items():
+            by_kind.setdefault(kind, {})[rid] = n
+        for kind, deltas in list(by_kind.items()):
+            repo = getattr(self.store, kind, None)
+            try:
+                if repo is not None:
+                    repo.add_views(deltas)
+            except Exception:
+                # 寫入失敗：把還沒寫成功的增量放回去，下一輪再試
+                with self._lock:
+                    for k, d in by_kind.items():
+                        for rid, n in d.items():
+                            self._pending[(k, rid)] = self._pending.get((k, rid), 0) + n
+                raise
+            del by_kind[kind]
+
+    compact = flush
+
+    def _run(self):
+        while not self._stop:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                time.sleep(1)  # 不讓背景執行緒因寫入失敗而結束
+
+    def close(self):
+        if self._stop:
+            return
+        self._stop = True
+        self._wake.set()
+        self._thread.join(timeout=5)
+        self.flush()
+
+
+def open_view_counter(store, mode=None):
+    mode = (mode or os.environ.get('FIXLOG_VIEW_MODE') or 'log').strip().lower()
+    if mode == 'buffer':
+        return ViewBuffer(store,
+                          flush_interval=float(os.environ.get('FIXLOG_VIEW_FLUSH_INTERVAL', 10)),
+                          flush_every=int(os.environ.get('FIXLOG_VIEW_FLUSH_EVERY', 500)))
+    if mode == 'sync':
+        return SyncViews(store)
+    if mode == 'log':
+        return ViewLog(store)
+    raise ValueError(f'unknown view mode: {mode}')
@@ -0,0 +1,58 @@
+# storage/importer.py
+# 一次性匯入：把 data/*.json 的內容搬進 SQLite
+#   python -m storage.importer [--db data/fixlog.db] [--force]
+import argparse, sys
+
+from .json_backend import JsonStore
+from .sqlite_backend import SqliteStore, DB_FILE
+
+
+def import_json(src, dst):
+    """src: JsonStore，dst: SqliteStore；回傳各類筆數"""
+    counts = {}
+    for name in ('repairs', 'tools'):
+        repo = getattr(src, name)
+        # all() 只有列表欄位，要連內文一起搬
+        items = [repo.get(r['id']) for r in repo.all()]
+        # JSON 清單第 0 筆是最新的，倒著插入才能保留原本順序
+        for r in reversed(items):
+            r.setdefault('views', 0)
+            getattr(dst, name).insert(r)
+        counts[name] = len(items)
+
+    users = src.users.all()
+    dst.users.replace_all(users)
+    counts['users'] = len(users)
+
+    # JsonDraftRepo 開啟時已把草稿搬成標準格式，可以直接寫入
+    drafts = src.drafts.all()
+    for d in drafts:
+        dst.drafts.insert(d)
+    counts['drafts'] = len(drafts)
+
+    prefs = src.prefs.all()
+    for user, p in prefs.items():
+        dst.prefs.set(user, p)
+    counts['prefs'] = len(prefs)
+    return counts
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='匯入 data/*.json 到 SQLite')
+    ap.add_argument('--db', default=DB_FILE)
+    ap.add_argument('--force', action='store_true', help='資料庫已有紀錄時仍然匯入')
+    args = ap.parse_args(argv)
+
+    dst = SqliteStore(args.db)
+    if not args.force and (dst.repairs.all() or dst.tools.all()):
+        print(f'{args.db} 已有資料，若要覆蓋請加 --force', file=sys.stderr)
+        return 1
+    counts = import_json(JsonStore(), dst)
+    dst.close()
+    for k, v in counts.items():
+        print(f'{k}: {v}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,560 @@
+# storage/json_backend.py
+# JSON 檔案後端：每次異動整檔重寫，適合資料量小的安裝
+# 多個 worker 同時跑時，讀寫都以 <檔名>.lock 的 fcntl 檔案鎖保護（Windows 無 fcntl，只有行程內的鎖）
+# 預設在請求執行緒上同步原子寫入；FIXLOG_WRITE_BEHIND=1 時交給背景 writer 合併寫入（見 writer.py），
+# 只適用單一行程：檔案鎖只包住讀與交付，真正寫檔在之後，別的行程會讀到舊檔再蓋掉，
+# 所以開了 write-behind 的行程會獨佔 data/.write-behind.lock，其他行程打不開 JSON store。
+# FIXLOG_WRITE_DELAY 為合併寫入的等待秒數；JSON 編解碼見 codec.py（FIXLOG_JSON_CODEC / FIXLOG_JSON_COMPACT）
+import os, re, sys, time, hashlib, threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from . import codec
+from .base import (RecordRepo, UserRepo, DraftRepo, PrefRepo, Store, BODY_FIELD, split_body,
+                   DRAFT_SCHEMA, canonical_draft, draft_time, newest_first, expired_drafts)
+from .writer import BackgroundWriter, atomic_write, DELETED
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+REPAIRS_FILE = os.path.join('data', 'repairs.json')
+TOOLS_FILE = os.path.join('data', 'tools.json')
+USERS_FILE = os.path.join('data', 'user_settings.json')
+DRAFTS_FILE = os.path.join(BASE_DIR, 'data', 'drafts.json')
+# 偏好設定一直都存在 templates/data/ 底下，沿用原位置避免舊設定遺失
+PREFS_FILE = os.path.join(BASE_DIR, 'templates', 'data', 'preferences.json')
+
+DEFAULT_USERS = [{
+    "username": "admin",
+    "password": "5550",
+    "role": "technician",
+    "active": True
+}]
+
+
+_held = threading.local()
+
+
+@contextmanager
+def file_lock(path, shared=False):
+    """跨行程的檔案鎖；同一執行緒重複進入（例如讀改寫裡面的讀）直接放行"""
+    held = getattr(_held, 'paths', None)
+    if held is None:
+        held = _held.paths = set()
+    key = os.path.abspath(path)
+    if fcntl is None or key in held:
+        yield
+        return
+    d = os.path.dirname(key)
+    os.makedirs(d, exist_ok=True)
+    with open(key + '.lock', 'a') as lf:
+        fcntl.flock(lf, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        held.add(key)
+        try:
+            yield
+        finally:
+            held.discard(key)
+            fcntl.flock(lf, fcntl.LOCK_UN)
+
+
+WANT_WRITE_BEHIND = os.environ.get('FIXLOG_WRITE_BEHIND', '0').strip().lower() in ('1', 'true', 'yes', 'on')
+WRITE_BEHIND = False  # JsonStore 開啟時由 claim_files() 決定
+writer = BackgroundWriter(delay=float(os.environ.get('FIXLOG_WRITE_DELAY', 0.05)), lock=file_lock)
+CLAIM_FILE = os.path.join(BASE_DIR, 'data', '.write-behind.lock')
+_claim = None
+
+
+def claim_files():
+    """開了 write-behind 的行程獨佔 JSON 檔（排他鎖），同步寫入的行程彼此共用（共享鎖）。
+    想開 write-behind 但已有別的行程在用：退回同步寫入。已有 write-behind 的行程在用：拒絕開啟"""
+    global WRITE_BEHIND, _claim
+    if _claim is not None:
+        return  # 已經決定過（fork 出來的 worker 沿用父行程的鎖）
+    if fcntl is None:
+        WRITE_BEHIND = WANT_WRITE_BEHIND  # 沒有 fcntl 本來就只支援單一行程
+        return
+    os.makedirs(os.path.dirname(CLAIM_FILE), exist_ok=True)
+    f = open(CLAIM_FILE, 'a')
+    if WANT_WRITE_BEHIND:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            WRITE_BEHIND, _claim = True, f
+            return
+        except OSError:
+            sys.stderr.write('FIXLOG_WRITE_BEHIND: 另有行程在使用 JSON 檔，改用同步寫入\n')
+    try:
+        fcntl.flock(f, fcntl.LOCK_SH | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        raise RuntimeError('另一個行程以 FIXLOG_WRITE_BEHIND=1 獨佔 JSON 檔；'
+                           '多個 worker 請關掉 write-behind 或改用 SQLite 後端')
+    WRITE_BEHIND, _claim = False, f
+
+
+def _after_fork():
+    # fork 出來的 worker 繼承了父行程的鎖，分不出彼此：一律同步寫入
+    global WRITE_BEHIND
+    WRITE_BEHIND = False
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def json_exists(path):
+    payload = writer.peek(os.path.abspath(path))
+    if payload is not None:
+        return payload is not DELETED
+    return os.path.exists(path)
+
+
+def write_bytes(path, payload, lock=True):
+    """交給 writer（或當場原子寫入）；payload 為 DELETED 時刪檔。lock=False 換檔時不拿檔案鎖"""
+    if WRITE_BEHIND:
+        writer.submit(os.path.abspath(path), payload, lock=lock)
+    else:
+        atomic_write(path, payload, file_lock if lock else None)
+
+
+def read_text(path):
+    """整個檔案的文字內容（含還沒落地的）；不存在回 None"""
+    payload = writer.peek(os.path.abspath(path))
+    if payload is not None:
+        return None if payload is DELETED else payload.decode('utf-8')
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def read_json(path, default, lock=True, tolerant=False):
+    """檔案不存在回 default。lock=False：檔案只會整份換掉（write_bytes(lock=False)），讀的時候不必拿共享鎖
+
+    內容解析不了時丟 ValueError，不當成空的：呼叫端接著寫入的話會拿空清單把整份資料蓋掉。
+    tolerant=True 才回 default（只給讀完就不再寫回的舊格式檔案用）。
+    """
+    payload = writer.peek(os.path.abspath(path))
+    if payload is DELETED:
+        return default
+    try:
+        if payload is None:
+            if not lock:
+                with open(path, 'rb') as f:
+                    payload = f.read()
+            else:
+                with file_lock(path, shared=True), open(path, 'rb') as f:
+                    payload = f.read()
+        return codec.loads(payload)
+    except FileNotFoundError:
+        return default
+    except ValueError as e:
+        if tolerant:
+            return default
+        raise ValueError(f'{path} 不是有效的 JSON（{e}）；為避免覆寫原本的資料，請先修正這個檔案') from e
+
+
+def write_json(path, data):
+    """序列化成一份快照後交給 writer（或當場原子寫入），呼叫端之後再改 data 也不影響"""
+    write_bytes(path, codec.dump_file(data))
+
+
+def file_version(path):
+    """檔案的 (mtime, 大小)；不存在回 None。自己剛寫的內容以交付次數為準，不必等落地"""
+    try:
+        st = os.stat(path)
+        disk = (st.st_mtime_ns, st.st_size)
+    except OSError:
+        disk = None
+    return writer.version(os.path.abspath(path), disk)
+
+
+_SAFE_ID_RE = re.compile(r'^[\w-]{1,100}$')
+
+
+class JsonRecordRepo(RecordRepo):
+    """列表欄位存在 data/<kind>.json，每筆內文另存 data/<kind>/<id>.html
+
+    舊版整份（含內文）的 JSON 第一次讀到時自動拆開。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.body_dir = os.path.splitext(path)[0]
+        self._lock = threading.RLock()
+
+    def _body_path(self, record_id):
+        rid = str(record_id)
+        if not _SAFE_ID_RE.match(rid):
+            rid = hashlib.sha1(rid.encode('utf-8')).hexdigest()
+        return os.path.join(self.body_dir, rid + '.html')
+
+    def _write_body(self, record_id, body):
+        if body is not None:
+            write_bytes(self._body_path(record_id), str(body).encode('utf-8'), lock=False)
+
+    def _split_legacy(self):
+        """舊格式：內文寫成各自的檔案，清單只留列表欄位"""
+        with self._lock, file_lock(self.path):
+            items = read_json(self.path, [])
+            metas = []
+            for r in items:
+                meta, body = split_body(r)
+                if BODY_FIELD in r:
+                    self._write_body(r['id'], body)
+                metas.append(meta)
+            write_json(self.path, metas)
+            return metas
+
+    def all(self):
+        items = read_json(self.path, [])
+        if any(BODY_FIELD in r for r in items):
+            items = self._split_legacy()
+        return items
+
+    def version(self):
+        return file_version(self.path)
+
+    def write(self, fn):
+        with self._lock, file_lock(self.path):
+            return super().write(fn)
+
+    def get(self, record_id):
+        meta = next((r for r in self.all() if r.get('id') == record_id), None)
+        if meta is None:
+            return None
+        body = self.body(record_id)
+        return meta if body is None else dict(meta, **{BODY_FIELD: body})
+
+    def body(self, record_id):
+        return read_text(self._body_path(record_id))
+
+    def insert(self, record):
+        meta, body = split_body(record)
+        with self._lock, file_lock(self.path):
+            self._write_body(record['id'], body)  # 先寫內文，清單裡出現的紀錄一定讀得到內文
+            items = self.all()
+            items.insert(0, meta)
+            write_json(self.path, items)
+
+    def update(self, record):
+        meta, body = split_body(record)
+        with self._lock, file_lock(self.path):
+            items = self.all()
+            for i, r in enumerate(items):
+                if r.get('id') == record['id']:
+                    self._write_body(record['id'], body)
+                    items[i] = meta
+                    write_json(self.path, items)
+                    return True
+        return False
+
+    def update_many(self, records):
+        by_id = {r['id']: r for r in records}
+        if not by_id:
+            return
+        with self._lock, file_lock(self.path):
+            items = self.all()
+            for i, r in enumerate(items):
+                rec = by_id.get(r.get('id'))
+                if rec is not None:
+                    items[i], body = split_body(rec)
+                    self._write_body(rec['id'], body)
+            write_json(self.path, items)
+
+    def delete(self, record_id):
+        with self._lock, file_lock(self.path):
+            items = self.all()
+            kept = [r for r in items if r.get('id') != record_id]
+            if len(kept) == len(items):
+                return False
+            write_json(self.path, kept)
+            write_bytes(self._body_path(record_id), DELETED, lock=False)
+            return True
+
+    def set_views(self, record_id, views):
+        with self._lock, file_lock(self.path):
+            items = self.all()
+            for r in items:
+                if r.get('id') == record_id:
+                    r['views'] = views
+                    write_json(self.path, items)
+                    return True
+        return False
+
+    def add_views(self, deltas):
+        if not deltas:
+            return
+        with self._lock, file_lock(self.path):
+            items = self.all()
+            for r in items:
+                n = deltas.get(r.get('id'))
+                if n:
+                    r['views'] = r.get('views', 0) + n
+            write_json(self.path, items)
+
+
+class JsonUserRepo(UserRepo):
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+
+    def _ensure_file(self):
+        if not json_exists(self.path):
+            write_json(self.path, DEFAULT_USERS)
+
+    def all(self):
+        self._ensure_file()
+        return read_json(self.path, [])
+
+    def get(self, username):
+        return next((u for u in self.all() if u.get('username') == username), None)
+
+    def version(self):
+        return file_version(self.path)
+
+    def write(self, fn):
+        with self._lock, file_lock(self.path):
+            return super().write(fn)
+
+    def upsert(self, user):
+        with self._lock, file_lock(self.path):
+            users = self.all()
+            for i, u in enumerate(users):
+                if u.get('username') == user['username']:
+                    users[i] = user
+                    break
+            else:
+                users.append(user)
+            write_json(self.path, users)
+
+    def delete(self, username):
+        with self._lock, file_lock(self.path):
+            users = self.all()
+            kept = [u for u in users if u.get('username') != username]
+            if len(kept) == len(users):
+                return False
+            write_json(self.path, kept)
+            return True
+
+    def replace_all(self, users):
+        with self._lock, file_lock(self.path):
+            write_json(self.path, users)
+
+
+def _safe_name(value):
+    """可以直接當檔名的就直接用，否則用 sha1"""
+    value = str(value)
+    if _SAFE_ID_RE.match(value):
+        return value
+    return hashlib.sha1(value.encode('utf-8')).hexdigest()
+
+
+def legacy_drafts(raw):
+    """舊的 drafts.json 歷來有四種形態：{"drafts":[...]}、單一物件、{user:[...]}、純清單，
+    攤平成標準格式的清單（{user:[...]} 形態裡沒寫擁有者的草稿歸給那位使用者）"""
+    if isinstance(raw, dict) and 'drafts' in raw and isinstance(raw['drafts'], list):
+        return [canonical_draft(d) for d in raw['drafts']]
+    if isinstance(raw, dict) and all(k in raw for k in ('title', 'category', 'details')):
+        return [canonical_draft(raw)]
+    if isinstance(raw, dict):
+        return [canonical_draft(d, owner) for owner, lst in raw.items() if isinstance(lst, list) for d in lst]
+    if isinstance(raw, list):
+        return [canonical_draft(d) for d in raw]
+    return []
+
+
+class JsonDraftRepo(DraftRepo):
+    """每位使用者一個檔案：data/drafts/<使用者>.json（新到舊），
+    另有 data/drafts/index.json 記錄 { 使用者: {file, latest, updated_at, count, oldest} }。
+
+    自動存檔只重寫那位使用者的檔案與很小的索引；找某人最新的草稿只要查索引。
+    每個行程第一次用到時做一次搬移（data/drafts/schema.json 記錄已搬到第幾版）：
+      - 舊的 data/drafts.json 拆開，原檔改名為 drafts.json.migrated 保留
+      - 各使用者檔裡的草稿改寫成標準格式（見 base.canonical_draft）
+    """
+
+    _RESERVED = ('index', 'schema')
+
+    def __init__(self, path):
+        self.legacy_path = path
+        self.dir = os.path.splitext(path)[0]
+        self.index_path = os.path.join(self.dir, 'index.json')
+        self.schema_path = os.path.join(self.dir, 'schema.json')
+        self.path = self.index_path  # 檔案鎖與變更戳記都以索引為準
+        self._lock = threading.RLock()
+        self._ready = False
+
+    def _user_path(self, name):
+        return os.path.join(self.dir, name + '.json')
+
+    def _index(self):
+        if not self._ready:
+            self._migrate()
+            self._ready = True
+        return read_json(self.index_path, {})
+
+    def _migrate(self):
+        # 一次性的搬移直接同步寫入：檔案都落地後才記下版本、把舊檔移開
+        with self._lock, file_lock(self.index_path):
+            index = read_json(self.index_path, {})
+            version = read_json(self.schema_path, {}).get('version', 0)
+            if version < DRAFT_SCHEMA:
+                now = time.time()
+                for key in list(index):
+                    owner = key or None
+                    items = [canonical_draft(d, owner, now) for d in self._load_user(index, owner)]
+                    self._write_user(index, owner, items, now=True)
+            legacy = legacy_drafts(read_json(self.legacy_path, {}, tolerant=True)) if os.path.exists(self.legacy_path) else []
+            by_owner = {}
+            for d in legacy:
+                by_owner.setdefault(d['owner'], []).append(d)
+            for owner, items in by_owner.items():
+                self._write_user(index, owner, items + self._load_user(index, owner), now=True)
+            if version < DRAFT_SCHEMA or by_owner:
+                atomic_write(self.index_path, codec.dump_file(index))
+            if version < DRAFT_SCHEMA:
+                atomic_write(self.schema_path, codec.dump_file({'version': DRAFT_SCHEMA}))
+            if by_owner:
+                # 空的舊檔（例如 {}）留著不動
+                os.replace(self.legacy_path, self.legacy_path + '.migrated')
+
+    def _load_user(self, index, owner):
+        entry = index.get(self._key(owner))
+        if not entry:
+            return []
+        return read_json(self._user_path(entry['file']), [], lock=False)
+
+    @staticmethod
+    def _key(owner):
+        return owner if owner is not None else ''
+
+    def _write_user(self, index, owner, items, now=False):
+        """寫回某位使用者的草稿（依 updated_at 新到舊）並更新索引；呼叫端負責寫索引"""
+        key = self._key(owner)
+        newest_first(items)
+        entry = index.get(key)
+        if entry is None:
+            name = _safe_name(key or '_nobody')
+            if name in self._RESERVED:  # 別和索引 / 版本檔撞名
+                name = hashlib.sha1(name.encode('utf-8')).hexdigest()
+            entry = {'file': name}
+        if items:
+            path = self._user_path(entry['file'])
+            if now:
+                atomic_write(path, codec.dump_file(items))
+            else:
+                # 使用者檔只在持有索引鎖時改寫，不必各自再開一把鎖
+                write_bytes(path, codec.dump_file(items), lock=False)
+            times = [t for t in map(draft_time, items) if t is not None]
+            entry.update(latest=items[0]['id'], updated_at=items[0].get('updated_at') or 0, count=len(items),
+                         oldest=min(times) if times else None)
+            index[key] = entry
+        else:
+            write_bytes(self._user_path(entry['file']), DELETED, lock=False)
+            index.pop(key, None)
+
+    def version(self):
+        return file_version(self.index_path)
+
+    def all(self):
+        index = self._index()
+        items = []
+        for key, entry in index.items():
+            items.extend(read_json(self._user_path(entry['file']), [], lock=False))
+        return items
+
+    def for_owner(self, owner):
+        return self._load_user(self._index(), owner)
+
+    def latest(self, owner=None):
+        index = self._index()
+        if owner is None:
+            if not index:
+                return None
+            owner = max(index, key=lambda k: draft_time(index[k]) or 0)
+        entry = index.get(self._key(owner))
+        if not entry:
+            return None
+        items = read_json(self._user_path(entry['file']), [], lock=False)
+        return next((d for d in items if d.get('id') == entry.get('latest')), items[0] if items else None)
+
+    def insert(self, draft):
+        owner = draft.get('owner')
+        with self._lock, file_lock(self.index_path):
+            index = self._index()
+            # 新的排最前面：同一秒內存的兩筆，後存的仍算最新
+            items = [draft] + [d for d in self._load_user(index, owner) if d.get('id') != draft.get('id')]
+            self._write_user(index, owner, items)
+            write_json(self.index_path, index)
+
+    def prune(self, max_per_user=None, older_than=None):
+        """索引記著每人的筆數與最舊時間，沒超過上限也沒過期的使用者不必讀檔"""
+        removed = 0
+        with self._lock, file_lock(self.index_path):
+            index = self._index()
+            dirty = False
+            for key, entry in list(index.items()):
+                over = max_per_user and entry.get('count', 0) > max_per_user
+                # 舊索引沒有 oldest 欄位：讀檔確認一次並補上；oldest 為 None 表示時間都不明，不會過期
+                oldest = entry.get('oldest', 0)
+                stale = older_than is not None and oldest is not None and oldest < older_than
+                if not over and not stale:
+                    continue
+                owner = key or None
+                items = self._load_user(index, owner)
+                drop = {id(d) for d in expired_drafts(items, max_per_user, older_than)}
+                if drop or 'oldest' not in entry:
+                    self._write_user(index, owner, [d for d in items if id(d) not in drop])
+                    removed += len(drop)
+                    dirty = True
+            if dirty:
+                write_json(self.index_path, index)
+        return removed
+
+    def delete(self, draft_id, owner=None):
+        with self._lock, file_lock(self.index_path):
+            index = self._index()
+            owners = [owner] if owner is not None else [k or None for k in index]
+            for o in owners:
+                items = self._load_user(index, o)
+                kept = [d for d in items if str(d.get('id')) != str(draft_id)]
+                if len(kept) != len(items):
+                    self._write_user(index, o, kept)
+                    write_json(self.index_path, index)
+                    return True
+            return False
+
+
+class JsonPrefRepo(PrefRepo):
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def all(self):
+        return read_json(self.path, {})
+
+    def get(self, username):
+        return self.all().get(username) or {}
+
+    def set(self, username, prefs):
+        with self._lock, file_lock(self.path):
+            allp = self.all()
+            allp[username] = prefs
+            write_json(self.path, allp)
+
+
+class JsonStore(Store):
+    kind = 'json'
+
+    def __init__(self, repairs_path=REPAIRS_FILE, tools_path=TOOLS_FILE, users_path=USERS_FILE,
+                 drafts_path=DRAFTS_FILE, prefs_path=PREFS_FILE):
+        claim_files()
+        self.repairs = JsonRecordRepo(repairs_path)
+        self.tools = JsonRecordRepo(tools_path)
+        self.users = JsonUserRepo(users_path)
+        self.drafts = JsonDraftRepo(drafts_path)
+        self.prefs = JsonPrefRepo(prefs_path)
@@ -0,0 +1,59 @@
+# storage/retention.py
+# 草稿保留政策：背景執行緒定期整理草稿，請求路徑上不做任何清理
+#   FIXLOG_DRAFT_MAX               —— 每位使用者最多保留幾筆（預設 0 不限）
+#   FIXLOG_DRAFT_TTL_DAYS          —— 超過幾天沒更新的草稿刪除（預設 0 不限）
+#
+# 兩者預設都關閉：舊版從來不刪草稿，升級後第一次啟動不該把搬過來的舊草稿清掉，要清理請自行設定
+#   FIXLOG_DRAFT_COMPACT_INTERVAL  —— 整理間隔秒數（預設 3600，0 關閉背景整理）
+#
+# 多個 worker 各自跑也沒關係：整理是冪等的，後端各自持有寫入鎖
+import os, time, threading, atexit
+
+
+class DraftRetention:
+    def __init__(self, repo, max_per_user=0, ttl_days=0, interval=3600, start=True):
+        self.repo = repo
+        self.max_per_user = max_per_user or None
+        self.ttl = ttl_days * 86400 if ttl_days else None
+        self.interval = interval
+        self.removed = 0
+        self._wake = threading.Event()
+        self._stop = False
+        self._thread = None
+        if start and interval:
+            self._thread = threading.Thread(target=self._run, name='draft-retention', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def compact(self):
+        """立刻整理一次；回傳刪除筆數"""
+        older_than = time.time() - self.ttl if self.ttl else None
+        if self.max_per_user is None and older_than is None:
+            return 0
+        n = self.repo.prune(self.max_per_user, older_than)
+        self.removed += n
+        return n
+
+    def _run(self):
+        while not self._stop:
+            try:
+                self.compact()
+            except Exception:
+                pass  # 整理失敗不影響服務，下一輪再試
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def close(self):
+        if self._stop:
+            return
+        self._stop = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+
+def open_retention(store):
+    return DraftRetention(store.drafts,
+                          max_per_user=int(os.environ.get('FIXLOG_DRAFT_MAX', 0)),
+                          ttl_days=float(os.environ.get('FIXLOG_DRAFT_TTL_DAYS', 0)),
+                          interval=float(os.environ.get('FIXLOG_DRAFT_COMPACT_INTERVAL', 3600)))
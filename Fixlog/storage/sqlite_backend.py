@@ -0,0 +1,347 @@
+# storage/sqlite_backend.py
+# SQLite 後端（WAL 模式）：新增 / 修改 / 刪除只動到那一列
+import os, sqlite3, threading
+from contextlib import contextmanager
+
+from . import codec
+from .base import RecordRepo, UserRepo, DraftRepo, PrefRepo, Store, BODY_FIELD, DRAFT_SCHEMA, canonical_draft
+from .json_backend import BASE_DIR, DEFAULT_USERS
+
+DB_FILE = os.path.join(BASE_DIR, 'data', 'fixlog.db')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS repairs (
+    id    TEXT PRIMARY KEY,
+    seq   INTEGER NOT NULL,
+    views INTEGER NOT NULL DEFAULT 0,
+    data  TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tools (
+    id    TEXT PRIMARY KEY,
+    seq   INTEGER NOT NULL,
+    views INTEGER NOT NULL DEFAULT 0,
+    data  TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    seq      INTEGER NOT NULL,
+    data     TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS drafts (
+    id         TEXT PRIMARY KEY,
+    owner      TEXT,
+    updated_at INTEGER NOT NULL DEFAULT 0,
+    data       TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS drafts_owner ON drafts (owner, updated_at);
+CREATE INDEX IF NOT EXISTS drafts_updated ON drafts (updated_at);
+CREATE TABLE IF NOT EXISTS prefs (
+    username TEXT PRIMARY KEY,
+    data     TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS versions (
+    name TEXT PRIMARY KEY,
+    v    INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+# 每張表任何內容異動都把 versions 裡的計數加一，給快取判斷要不要重新載入；
+# 只改瀏覽數時另外記在 '<表>.views'，其他 worker 只需補上瀏覽數，不必整份重載
+_VERSIONED = ('repairs', 'tools', 'users')
+
+
+def _bump(name):
+    return f"BEGIN UPDATE versions SET v = v + 1 WHERE name = '{name}'; END;\n"
+
+
+for _t in _VERSIONED:
+    _SCHEMA += f"INSERT OR IGNORE INTO versions (name, v) VALUES ('{_t}', 0);\n"
+    _SCHEMA += f"DROP TRIGGER IF EXISTS {_t}_update_v;\n"
+    _SCHEMA += f"CREATE TRIGGER IF NOT EXISTS {_t}_insert_v AFTER INSERT ON {_t} " + _bump(_t)
+    _SCHEMA += f"CREATE TRIGGER IF NOT EXISTS {_t}_delete_v AFTER DELETE ON {_t} " + _bump(_t)
+    _SCHEMA += f"CREATE TRIGGER IF NOT EXISTS {_t}_data_v AFTER UPDATE OF data ON {_t} " + _bump(_t)
+for _t in ('repairs', 'tools'):
+    _SCHEMA += f"INSERT OR IGNORE INTO versions (name, v) VALUES ('{_t}.views', 0);\n"
+    _SCHEMA += f"CREATE TRIGGER IF NOT EXISTS {_t}_views_v AFTER UPDATE OF views ON {_t} " + _bump(f'{_t}.views')
+
+
+def _version(conn, name):
+    row = conn.get().execute('SELECT v FROM versions WHERE name = ?', (name,)).fetchone()
+    return row[0] if row else None
+
+
+def _dumps(obj):
+    return codec.dumps(obj).decode('utf-8')  # 存成 TEXT，SQLite 的 json 函式才能用
+
+
+class _Conn:
+    """每個執行緒一條連線；Flask 開發伺服器與 gunicorn threads 都適用"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        with self.get() as db:
+            db.executescript(_SCHEMA)
+
+    def get(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db = db
+        return db
+
+    @contextmanager
+    def tx(self):
+        """一般寫入：自己一個交易；已經在 write() 開好的交易裡就併進去，由外層提交"""
+        db = self.get()
+        if db.in_transaction:
+            yield db
+        else:
+            with db:
+                yield db
+
+    def close(self):
+        db = getattr(self._local, 'db', None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+
+class SqliteRecordRepo(RecordRepo):
+    def __init__(self, conn, table):
+        self.conn = conn
+        self.table = table
+
+    def _row(self, data, views):
+        r = codec.loads(data)
+        r['views'] = views
+        return r
+
+    def all(self):
+        # 列表欄位：內文留在資料庫裡，不載入
+        rows = self.conn.get().execute(
+            f"SELECT json_remove(data, '$.{BODY_FIELD}'), views FROM {self.table} ORDER BY seq DESC").fetchall()
+        return [self._row(d, v) for d, v in rows]
+
+    def body(self, record_id):
+        row = self.conn.get().execute(
+            f"SELECT json_extract(data, '$.{BODY_FIELD}') FROM {self.table} WHERE id = ?", (record_id,)).fetchone()
+        return row[0] if row else None
+
+    def version(self):
+        return _version(self.conn, self.table)
+
+    def views_version(self):
+        return _version(self.conn, f'{self.table}.views')
+
+    def write(self, fn):
+        # BEGIN IMMEDIATE 先拿到寫入鎖，前後兩次讀戳記之間別的連線寫不進來
+        db = self.conn.get()
+        with db:
+            db.execute('BEGIN IMMEDIATE')
+            before = (self.version(), self.views_version())
+            result = fn()
+            return result, before, (self.version(), self.views_version())
+
+    def views_map(self):
+        return dict(self.conn.get().execute(f'SELECT id, views FROM {self.table}').fetchall())
+
+    def get(self, record_id):
+        row = self.conn.get().execute(
+            f'SELECT data, views FROM {self.table} WHERE id = ?', (record_id,)).fetchone()
+        return self._row(*row) if row else None
+
+    def insert(self, record):
+        with self.conn.tx() as db:
+            db.execute(
+                f'INSERT OR REPLACE INTO {self.table} (id, seq, views, data) '
+                f'VALUES (?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM {self.table}), ?, ?)',
+                (record['id'], record.get('views', 0), _dumps(record)))
+
+    def update(self, record):
+        data = '?'
+        if BODY_FIELD not in record:
+            # 只給列表欄位：沿用資料庫裡原本的內文
+            data = f"json_set(?, '$.{BODY_FIELD}', json_extract(data, '$.{BODY_FIELD}'))"
+        with self.conn.tx() as db:
+            cur = db.execute(f'UPDATE {self.table} SET views = ?, data = {data} WHERE id = ?',
+                             (record.get('views', 0), _dumps(record), record['id']))
+        return cur.rowcount > 0
+
+    def delete(self, record_id):
+        with self.conn.tx() as db:
+            cur = db.execute(f'DELETE FROM {self.table} WHERE id = ?', (record_id,))
+        return cur.rowcount > 0
+
+    def set_views(self, record_id, views):
+        with self.conn.tx() as db:
+            cur = db.execute(f'UPDATE {self.table} SET views = ? WHERE id = ?', (views, record_id))
+        return cur.rowcount > 0
+
+    def add_views(self, deltas):
+        if not deltas:
+            return
+        with self.conn.tx() as db:
+            db.executemany(f'UPDATE {self.table} SET views = views + ? WHERE id = ?',
+                           [(n, rid) for rid, n in deltas.items()])
+
+
+class SqliteUserRepo(UserRepo):
+    def __init__(self, conn):
+        self.conn = conn
+
+    def all(self):
+        rows = self.conn.get().execute('SELECT data FROM users ORDER BY seq').fetchall()
+        return [codec.loads(d) for (d,) in rows]
+
+    def get(self, username):
+        row = self.conn.get().execute('SELECT data FROM users WHERE username = ?', (username,)).fetchone()
+        return codec.loads(row[0]) if row else None
+
+    def version(self):
+        return _version(self.conn, 'users')
+
+    def write(self, fn):
+        db = self.conn.get()
+        with db:
+            db.execute('BEGIN IMMEDIATE')
+            before = self.version()
+            result = fn()
+            return result, before, self.version()
+
+    def upsert(self, user):
+        with self.conn.tx() as db:
+            cur = db.execute('UPDATE users SET data = ? WHERE username = ?', (_dumps(user), user['username']))
+            if cur.rowcount == 0:
+                db.execute('INSERT INTO users (username, seq, data) '
+                           'VALUES (?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM users), ?)',
+                           (user['username'], _dumps(user)))
+
+    def delete(self, username):
+        with self.conn.tx() as db:
+            cur = db.execute('DELETE FROM users WHERE username = ?', (username,))
+        return cur.rowcount > 0
+
+    def replace_all(self, users):
+        with self.conn.tx() as db:
+            db.execute('DELETE FROM users')
+            db.executemany('INSERT INTO users (username, seq, data) VALUES (?, ?, ?)',
+                           [(u['username'], i, _dumps(u)) for i, u in enumerate(users)])
+
+
+class SqliteDraftRepo(DraftRepo):
+    def __init__(self, conn):
+        self.conn = conn
+        self._migrate()
+
+    def _migrate(self):
+        """把舊格式的草稿改寫成標準格式；versions 表的 'drafts.schema' 記錄已搬到第幾版"""
+        db = self.conn.get()
+        if (_version(self.conn, 'drafts.schema') or 0) >= DRAFT_SCHEMA:
+            return
+        with db:
+            db.execute('BEGIN IMMEDIATE')  # 多個 worker 同時啟動時只有一個真的搬
+            if (_version(self.conn, 'drafts.schema') or 0) >= DRAFT_SCHEMA:
+                return
+            for old_id, data in db.execute('SELECT id, data FROM drafts').fetchall():
+                d = canonical_draft(codec.loads(data))
+                if d['id'] != old_id:
+                    db.execute('DELETE FROM drafts WHERE id = ?', (old_id,))
+                db.execute('INSERT OR REPLACE INTO drafts (id, owner, updated_at, data) VALUES (?, ?, ?, ?)',
+                           (d['id'], d['owner'], d['updated_at'], _dumps(d)))
+            db.execute("INSERT OR REPLACE INTO versions (name, v) VALUES ('drafts.schema', ?)", (DRAFT_SCHEMA,))
+
+    def all(self):
+        rows = self.conn.get().execute('SELECT data FROM drafts ORDER BY updated_at').fetchall()
+        return [codec.loads(d) for (d,) in rows]
+
+    def for_owner(self, owner):
+        rows = self.conn.get().execute(
+            'SELECT data FROM drafts WHERE owner IS ? ORDER BY updated_at DESC, rowid DESC', (owner,)).fetchall()
+        return [codec.loads(d) for (d,) in rows]
+
+    def latest(self, owner=None):
+        # 走 (owner, updated_at) / (updated_at) 索引，只取一列
+        if owner is None:
+            row = self.conn.get().execute(
+                'SELECT data FROM drafts ORDER BY updated_at DESC, rowid DESC LIMIT 1').fetchone()
+        else:
+            row = self.conn.get().execute(
+                'SELECT data FROM drafts WHERE owner = ? ORDER BY updated_at DESC, rowid DESC LIMIT 1',
+                (owner,)).fetchone()
+        return codec.loads(row[0]) if row else None
+
+    def get(self, draft_id, owner=None):
+        row = self.conn.get().execute('SELECT data FROM drafts WHERE id = ?', (str(draft_id),)).fetchone()
+        return codec.loads(row[0]) if row else None
+
+    def insert(self, draft):
+        with self.conn.get() as db:
+            db.execute('INSERT OR REPLACE INTO drafts (id, owner, updated_at, data) VALUES (?, ?, ?, ?)',
+                       (draft['id'], draft.get('owner'), draft.get('updated_at') or 0, _dumps(draft)))
+
+    def prune(self, max_per_user=None, older_than=None):
+        removed = 0
+        with self.conn.get() as db:
+            if older_than is not None:
+                # updated_at 為 0 表示時間不明，不當作過期
+                removed += db.execute('DELETE FROM drafts WHERE updated_at > 0 AND updated_at < ?',
+                                      (older_than,)).rowcount
+            if max_per_user:
+                removed += db.execute(
+                    'DELETE FROM drafts WHERE rowid IN ('
+                    ' SELECT rowid FROM ('
+                    '  SELECT rowid, ROW_NUMBER() OVER'
+                    '   (PARTITION BY owner ORDER BY updated_at DESC, rowid DESC) AS n FROM drafts)'
+                    ' WHERE n > ?)', (max_per_user,)).rowcount
+        return removed
+
+    def delete(self, draft_id, owner=None):
+        with self.conn.get() as db:
+            if owner is None:
+                cur = db.execute('DELETE FROM drafts WHERE id = ?', (str(draft_id),))
+            else:
+                cur = db.execute('DELETE FROM drafts WHERE id = ? AND owner = ?', (str(draft_id), owner))
+        return cur.rowcount > 0
+
+
+class SqlitePrefRepo(PrefRepo):
+    def __init__(self, conn):
+        self.conn = conn
+
+    def all(self):
+        rows = self.conn.get().execute('SELECT username, data FROM prefs').fetchall()
+        return {u: codec.loads(d) for u, d in rows}
+
+    def get(self, username):
+        row = self.conn.get().execute('SELECT data FROM prefs WHERE username = ?', (username,)).fetchone()
+        return codec.loads(row[0]) if row else {}
+
+    def set(self, username, prefs):
+        with self.conn.get() as db:
+            db.execute('INSERT OR REPLACE INTO prefs (username, data) VALUES (?, ?)',
+                       (username, _dumps(prefs)))
+
+
+class SqliteStore(Store):
+    kind = 'sqlite'
+
+    def __init__(self, path=DB_FILE):
+        self.path = path
+        self.conn = _Conn(path)
+        self.repairs = SqliteRecordRepo(self.conn, 'repairs')
+        self.tools = SqliteRecordRepo(self.conn, 'tools')
+        self.users = SqliteUserRepo(self.conn)
+        self.drafts = SqliteDraftRepo(self.conn)
+        self.prefs = SqlitePrefRepo(self.conn)
+        # 與 JSON 後端一致：沒有任何使用者時建立預設管理員
+        if not self.conn.get().execute('SELECT 1 FROM users LIMIT 1').fetchone():
+            self.users.replace_all(DEFAULT_USERS)
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,145 @@
+# storage/viewlog.py
+# 瀏覽次數事件記錄：每次瀏覽只 append 一行，定期壓實回主資料
+#
+# 檔案格式：每行 "<kind>\t<id>\t<n>"，kind 為 repairs / tools
+# 記錄檔本身就是「尚未壓實的增量」：每個行程從上次讀到的位置接著讀，
+# 所以多個 worker 共用同一個檔案時，彼此的瀏覽數都看得到。
+# 背景執行緒每 compact_interval 秒（或累積 compact_every 筆時提早被叫醒）整批寫回 store 並換一個空的記錄檔，
+# 請求路徑上只有 append，不做壓實。
+#
+# 多 worker：append 時拿 <檔名>.lock 的共用鎖、壓實時拿獨佔鎖，
+# 壓實是「換新檔」而不是截斷，其他 worker 發現檔案換了（inode 不同）就重新開檔、歸零增量，
+# 不會有兩個 worker 各自把同一批事件寫回兩次。
+import os, time, threading, atexit
+
+from .json_backend import BASE_DIR, file_lock
+
+VIEWLOG_FILE = os.path.join(BASE_DIR, 'data', 'views.log')
+
+
+class ViewLog:
+    writes_store = False  # record() 只 append 記錄檔，壓實時才寫 store
+
+    def __init__(self, store, path=VIEWLOG_FILE, compact_every=1000, compact_interval=300):
+        self.store = store
+        self.path = path
+        self.compact_every = compact_every
+        self.compact_interval = compact_interval
+        self._lock = threading.Lock()
+        self._pending = {}          # { (kind, id): 尚未壓實的增量 }
+        self._events = 0
+        self._offset = 0            # 記錄檔已讀到的位置
+        self._fh = None
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._lock, file_lock(self.path, shared=True):
+            self._catch_up()
+        self._wake = threading.Event()
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name='view-log-compact', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _reset(self):
+        if self._fh is not None:
+            self._fh.close()
+        self._fh = open(self.path, 'ab')
+        self._pending.clear()
+        self._events = 0
+        self._offset = 0
+
+    def _catch_up(self):
+        """讀入其他 worker（和自己）新 append 的事件；呼叫端要持有檔案鎖"""
+        if self._fh is None or os.fstat(self._fh.fileno()).st_ino != os.stat(self.path).st_ino:
+            self._reset()  # 第一次開檔，或記錄檔已被別的 worker 壓實換掉
+        with open(self.path, 'rb') as f:
+            f.seek(self._offset)
+            data = f.read()
+        end = data.rfind(b'\n') + 1  # 當機時寫到一半的最後一行先不讀
+        self._offset += end
+        for line in data[:end].decode('utf-8', 'replace').splitlines():
+            parts = line.split('\t')
+            if len(parts) != 3:
+                continue
+            kind, rid, n = parts
+            try:
+                n = int(n)
+            except ValueError:
+                continue
+            key = (kind, rid)
+            self._pending[key] = self._pending.get(key, 0) + n
+            self._events += 1
+
+    def record(self, kind, record_id, n=1):
+        """記一筆瀏覽事件（一次小 append）"""
+        with self._lock:
+            with file_lock(self.path, shared=True):
+                self._catch_up()
+                self._fh.write(f'{kind}\t{record_id}\t{n}\n'.encode('utf-8'))
+                self._fh.flush()
+                self._catch_up()
+            if self._events >= self.compact_every:
+                self._wake.set()  # 累積夠多了，叫背景執行緒提早壓實
+
+    def views(self, kind, read):
+        """read() 讀 store 的 { id: 瀏覽數 }，加上尚未壓實的增量
+
+        先 _catch_up()（記錄檔被別的 worker 壓實換掉的話增量會歸零），而且整段拿著記錄檔的共用鎖，
+        壓實（獨佔鎖）不會插在讀 store 與讀增量之間，已經寫回 store 的瀏覽數不會再加一次。
+        """
+        with self._lock, file_lock(self.path, shared=True):
+            self._catch_up()
+            views = read()
+            for (k, rid), n in self._pending.items():
+                if k == kind and rid in views:
+                    views[rid] = (views[rid] or 0) + n
+        return views
+
+    def fold(self, kind, records):
+        """把尚未壓實的增量加到從 store 讀出來的紀錄上（就地修改並回傳）"""
+        with self._lock, file_lock(self.path, shared=True):
+            self._catch_up()
+            if self._pending:
+                for r in records:
+                    n = self._pending.get((kind, r.get('id')))
+                    if n:
+                        r['views'] = r.get('views', 0) + n
+        return records
+
+    def compact(self):
+        """把累積的增量寫回 store，然後換成空的記錄檔"""
+        with self._lock, file_lock(self.path):
+            self._catch_up()
+            if not self._pending:
+                return
+            by_kind = {}
+            for (kind, rid), n in self._pending.items():
+                by_kind.setdefault(kind, {})[rid] = n
+            for kind, deltas in by_kind.items():
+                repo = getattr(self.store, kind, None)
+                if repo is not None:
+                    repo.add_views(deltas)
+            # 寫回後才換檔；若在兩者之間當機，重啟時這一批會被重複計入
+            tmp = self.path + '.new'
+            open(tmp, 'wb').close()
+            os.replace(tmp, self.path)
+            self._reset()
+
+    def _run(self):
+        while not self._stop:
+            self._wake.wait(self.compact_interval)
+            self._wake.clear()
+            if self._stop:
+                break
+            try:
+                self.compact()
+            except Exception:
+                time.sleep(1)  # 不讓背景執行緒因寫入失敗而結束
+
+    def close(self):
+        if self._fh is None or self._fh.closed:
+            return
+        self._stop = True
+        self._wake.set()
+        self._thread.join(timeout=5)
+        self.compact()
+        self._fh.close()
@@ -0,0 +1,183 @@
+# storage/writer.py
+# 背景寫檔（group commit）：請求執行緒只把整份新內容交給 writer 就返回，
+# 背景執行緒每 delay 秒整批寫出；同一個檔案在這段時間內改了 50 次也只寫一次（只留最後一份）。
+#
+# 每次寫檔：寫暫存檔 → fsync → os.replace 換上，當機時檔案不是舊版就是新版，不會只寫一半。
+# 還沒落地的內容由 peek() 提供，讀寫同一個檔案的程式看得到自己剛寫的資料。
+#
+# 只能用在單一行程：檔案鎖放開時內容還沒落地，別的行程會讀到舊檔、改完再蓋掉這次的修改。
+# json_backend.claim_files() 負責把關：開了 write-behind 的行程獨佔 JSON 檔，其他行程打不開。
+import os, time, tempfile, threading, atexit
+from contextlib import nullcontext
+
+# submit(path, DELETED)：刪除檔案（同樣排進佇列，避免晚到的舊內容又把檔案寫回來）
+DELETED = object()
+
+
+def _fsync_dir(d):
+    try:
+        fd = os.open(d, os.O_RDONLY)
+    except OSError:
+        return  # Windows 不能開資料夾，略過
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _read_umask():
+    mask = os.umask(0)  # 只能「設定並取回舊值」，馬上設回去
+    os.umask(mask)
+    return mask
+
+
+_UMASK = _read_umask()
+
+
+def file_mode(path=None):
+    """換檔後該有的權限：已有的檔案沿用原本的，新檔照 umask（和 open() 建的檔一樣，通常 0644）"""
+    if path is not None:
+        try:
+            return os.stat(path).st_mode & 0o7777
+        except OSError:
+            pass
+    return 0o666 & ~_UMASK
+
+
+def temp_file(d, mode=None, prefix=None, suffix='.tmp'):
+    """在資料夾 d 建暫存檔，回傳 (fd, 路徑)。mkstemp 建的檔是 0600，os.replace 換上去後會一直是 0600，
+    備份、管理腳本或前端網頁伺服器（別的使用者）就讀不到；所以先改成 mode（預設照 umask）"""
+    fd, tmp = tempfile.mkstemp(dir=d, prefix=prefix, suffix=suffix)
+    mode = file_mode() if mode is None else mode
+    try:
+        if hasattr(os, 'fchmod'):
+            os.fchmod(fd, mode)
+        else:
+            os.chmod(tmp, mode)  # Windows：只有唯讀位元有意義
+    except BaseException:
+        os.close(fd)
+        os.remove(tmp)
+        raise
+    return fd, tmp
+
+
+def atomic_write(path, payload, lock=None):
+    """寫暫存檔、fsync 後 os.replace；lock(path) 只包住換檔那一下。回傳寫入後的 os.stat"""
+    d = os.path.dirname(path) or '.'
+    if payload is DELETED:
+        with (lock(path) if lock else nullcontext()):
+            if os.path.exists(path):
+                os.remove(path)
+        return None
+    os.makedirs(d, exist_ok=True)
+    fd, tmp = temp_file(d, file_mode(path), prefix=os.path.basename(path) + '.')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        with (lock(path) if lock else nullcontext()):
+            os.replace(tmp, path)
+            st = os.stat(path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    _fsync_dir(d)
+    return st
+
+
+class BackgroundWriter:
+    def __init__(self, delay=0.05, lock=None):
+        self.delay = delay
+        self.lock = lock
+        self._cond = threading.Condition()
+        self._pending = {}     # { path: bytes } 等著寫的最新內容
+        self._inflight = {}    # { path: bytes } 正在寫的內容
+        self._gen = {}         # { path: 交付次數 }，當作自己寫入的版本
+        self._own = {}         # { path: 自己最後一次寫完的 (mtime, 大小) }
+        self._unlocked = set() # 不需要檔案鎖的路徑（一筆一檔的內文，換檔本身就是原子的）
+        self._thread = None
+        self._stop = False
+        self.writes = 0        # 實際寫檔次數（觀察 group commit 效果用）
+        atexit.register(self.close)
+
+    def submit(self, path, payload, lock=True):
+        """交付整份新內容（bytes 或 DELETED），立即返回"""
+        with self._cond:
+            if not lock:
+                self._unlocked.add(path)
+            self._pending[path] = payload
+            self._gen[path] = self._gen.get(path, 0) + 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='json-writer', daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def peek(self, path):
+        """還沒落地的內容（bytes 或 DELETED）；沒有就回 None"""
+        with self._cond:
+            payload = self._pending.get(path)
+            return payload if payload is not None else self._inflight.get(path)
+
+    def version(self, path, disk):
+        """檔案的變更戳記：自己寫的（不管落地了沒）用交付次數，被別人改過才用磁碟上的戳記"""
+        with self._cond:
+            gen = self._gen.get(path)
+            if gen is None:
+                return disk
+            if path in self._pending or path in self._inflight or disk == self._own.get(path):
+                return ('w', gen)
+            return disk
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._stop:
+                    self._cond.wait()
+                if self._stop and not self._pending:
+                    return
+            if not self._stop:
+                time.sleep(self.delay)  # 等一下，讓同一批的修改併成一次寫入
+            with self._cond:
+                batch, self._pending = self._pending, {}
+                self._inflight.update(batch)
+            for path, payload in batch.items():
+                try:
+                    st = atomic_write(path, payload, None if path in self._unlocked else self.lock)
+                except Exception:
+                    with self._cond:
+                        # 寫入失敗：這段時間沒有更新的內容就放回去，下一輪再試
+                        self._pending.setdefault(path, payload)
+                        self._inflight.pop(path, None)
+                    time.sleep(1)
+                    continue
+                with self._cond:
+                    self.writes += 1
+                    self._own[path] = (st.st_mtime_ns, st.st_size) if st else None
+                    if self._inflight.get(path) is payload:
+                        del self._inflight[path]
+                    self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """等目前交付的內容全部落地；回傳是否完成"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._cond.notify_all()
+            while self._pending or self._inflight:
+                if self._thread is None or not self._thread.is_alive():
+                    return False
+                left = None if deadline is None else deadline - time.monotonic()
+                if left is not None and left <= 0:
+                    return False
+                self._cond.wait(left)
+        return True
+
+    def close(self):
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
@@ -1,33 +1,64 @@
 # utils/user_store.py
-import os, json, threading
+import os, threading
+from storage import get_store
 
-USERS_FILE = os.path.join('data', 'user_settings.json')  # 统一用这一份
+USERS_FILE = os.path.join('data', 'user_settings.json')  # JSON 後端用這一份；SQLite 後端存在 users 表
 _lock = threading.Lock()
 
+# 使用者目錄快取：{ username: user }
+# 檔案（或 users 表）的變更戳記改變才重新載入；自己寫入時直接更新快取
+_cache = None
+_cache_version = None
+
+def _directory():
+    global _cache, _cache_version
+    repo = get_store().users
+    # 先讀戳記再讀內容：中間有人寫入的話，記下的是舊戳記，下一次會再載入一次，不會把新內容漏掉
+    version = repo.version()
+    if _cache is None or version != _cache_version:
+        with _lock:
+            users = repo.all()
+            _cache = {u.get('username'): u for u in users}
+            _cache_version = version
+    return _cache
+
+def _write(fn):
+    """自己寫入：寫之前的戳記和快取的一致（期間沒有別人改過）才記下新戳記，否則下次重新載入"""
+    global _cache_version
+    result, before, after = get_store().users.write(fn)
+    if before == _cache_version:
+        _cache_version = after
+    return result
+
 def ensure_file():
-    os.makedirs(os.path.dirname(USERS_FILE), exist_ok=True)
-    if not os.path.exists(USERS_FILE):
-        with open(USERS_FILE, 'w', encoding='utf-8') as f:
-            json.dump([{
-                "username": "admin",
-                "password": "5550",
-                "role": "technician",
-                "active": True
-            }], f, ensure_ascii=False, indent=2)
+    # 預設管理員由 storage 後端負責建立
+    _directory()
 
 def load_users():
-    ensure_file()
-    with open(USERS_FILE, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    return [dict(u) for u in _directory().values()]
 
 def save_users(users):
-    ensure_file()
+    global _cache, _cache_version
+    repo = get_store().users
+    with _lock:
+        # 整份覆寫：寫完的內容就是快取的內容，戳記直接用寫入後的
+        _, _, _cache_version = repo.write(lambda: repo.replace_all(users))
+        _cache = {u.get('username'): dict(u) for u in users}
+
+def save_user(user):
+    """只寫入單一使用者（新增或更新）"""
+    directory = _directory()
+    with _lock:
+        _write(lambda: get_store().users.upsert(user))
+        directory[user['username']] = dict(user)
+
+def delete_user(username):
+    directory = _directory()
     with _lock:
-        with open(USERS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(users, f, ensure_ascii=False, indent=2)
+        ok = _write(lambda: get_store().users.delete(username))
+        directory.pop(username, None)
+        return ok
 
 def find_user(username):
-    for u in load_users():
-        if u.get('username') == username:
-            return u
-    return None
\ No newline at end of file
+    u = _directory().get(username)
+    return dict(u) if u else None
\ No newline at end of file
@@ -0,0 +1,68 @@
+# viewed.py
+# 「這個 session 看過哪些紀錄」：同一個人重複打開同一篇只算一次瀏覽
+#
+# 以前把看過的 id 全部放進 session cookie（session['viewed'] / session['viewed_tools']），
+# 看得越多 cookie 越大，每個請求都要帶著它。現在 session 裡只放兩個固定大小的 Bloom filter：
+# 目前時段與上一個時段，看過多少篇 cookie 都一樣大。每 FIXLOG_VIEWED_WINDOW 小時輪替一次，
+# 兩個時段以前看過的再打開會再算一次瀏覽。
+#
+# Bloom filter 只會誤判成「看過」（少算一次瀏覽），不會多算；
+# 預設 2048 位元、4 個雜湊，一個時段看 200 篇時誤判率約 1%。
+#   FIXLOG_VIEWED_BITS   —— 每個 filter 的位元數（8 的倍數，預設 2048）
+#   FIXLOG_VIEWED_WINDOW —— 時段長度（小時，預設 24）
+import os, time, hashlib
+
+from flask import session
+
+BITS = int(os.environ.get('FIXLOG_VIEWED_BITS', 2048)) // 8 * 8
+HASHES = 4
+WINDOW = float(os.environ.get('FIXLOG_VIEWED_WINDOW', 24)) * 3600
+
+# 舊版 cookie 裡的清單 → 對應的紀錄種類
+_LEGACY = (('viewed', 'repairs'), ('viewed_tools', 'tools'))
+
+
+class BloomFilter:
+    def __init__(self, bits=BITS, hashes=HASHES, data=None):
+        self.bits = bits
+        self.hashes = hashes
+        # 長度不符（例如改了 FIXLOG_VIEWED_BITS）就當成空的重來
+        self.data = bytearray(data) if data is not None and len(data) == bits // 8 else bytearray(bits // 8)
+
+    def _positions(self, key):
+        h = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        a = int.from_bytes(h[:8], 'little')
+        b = int.from_bytes(h[8:], 'little') | 1
+        return [(a + i * b) % self.bits for i in range(self.hashes)]
+
+    def __contains__(self, key):
+        return all(self.data[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+    def add(self, key):
+        for p in self._positions(key):
+            self.data[p >> 3] |= 1 << (p & 7)
+
+
+def first_view(kind, record_id):
+    """這個 session 最近沒看過這筆紀錄就記下來並回傳 True"""
+    key = f'{kind}:{record_id}'
+    window = int(time.time() // WINDOW)
+    state = session.get('seen') or {}
+    cur = BloomFilter(data=state.get('cur'))
+    prev = BloomFilter(data=state.get('prev'))
+    changed = state.get('w') != window
+    if changed:
+        # 進入新時段：目前的變成上一個；隔了不只一個時段就兩個都清掉
+        prev = cur if state.get('w') == window - 1 else BloomFilter()
+        cur = BloomFilter()
+    for legacy_key, legacy_kind in _LEGACY:
+        if legacy_key in session:
+            for rid in session.pop(legacy_key) or ():
+                cur.add(f'{legacy_kind}:{rid}')
+            changed = True
+    seen = key in cur or key in prev
+    if not seen:
+        cur.add(key)
+    if changed or not seen:
+        session['seen'] = {'w': window, 'cur': bytes(cur.data), 'prev': bytes(prev.data)}
+    return not seen